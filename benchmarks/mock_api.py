@@ -0,0 +1,86 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+
+def fake_media(anilist_id: int) -> dict:
+    """anilist Media object with the fields kori asks for"""
+    return {
+        "id": anilist_id,
+        "idMal": anilist_id + 100000,
+        "title": {"romaji": f"Anime {anilist_id}", "english": f"Anime {anilist_id} EN", "native": None},
+        "description": f"<p>synopsis of anime {anilist_id}, a <i>story</i> about heroes and villains.</p>" * 4,
+        "episodes": 12,
+        "averageScore": 70 + anilist_id % 30,
+    }
+
+
+def fake_mappings(anilist_id: int, episodes: int = 12) -> dict:
+    """ani.zip mappings response with `episodes` regular episodes"""
+    return {
+        "mappings": {"anilist_id": anilist_id},
+        "episodes": {
+            str(number): {
+                "episode": str(number),
+                "title": {"en": f"Episode {number}"},
+                "summary": f"episode {number} of anime {anilist_id}: the heroes travel to a new town.",
+            }
+            for number in range(1, episodes + 1)
+        },
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, igual as apis de verdade
+    disable_nagle_algorithm = True  # headers e body saem em writes separados, sem isso cada resposta espera o ack atrasado
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        # anilist graphql: Media(id) ou Page(media(id_in))
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        variables = request.get("variables") or {}
+        if "ids" in variables:
+            media = [fake_media(int(anilist_id)) for anilist_id in variables["ids"]]
+            self._reply({"data": {"Page": {"pageInfo": {"hasNextPage": False}, "media": media}}})
+        else:
+            self._reply({"data": {"Media": fake_media(int(variables.get("id", 1)))}})
+
+    def do_GET(self):
+        # ani.zip: /mappings?anilist_id=N
+        query = parse_qs(urlparse(self.path).query)
+        self._reply(fake_mappings(int(query.get("anilist_id", ["1"])[0])))
+
+
+class MockAPIServer:
+    """local anilist + ani.zip stand-in on 127.0.0.1, served from a background thread"""
+
+    def __init__(self, port: int = 0):
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "MockAPIServer":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
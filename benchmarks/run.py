@@ -0,0 +1,398 @@
+"""
+kori benchmark runner, from the repository root:
+
+    python -m benchmarks.run                                # everything, results as json on stdout
+    python -m benchmarks.run --sizes 500,5000 --only preprocess,top_k --out results.json
+    python -m benchmarks.run --out benchmarks/baseline.json  # store a baseline
+    python -m benchmarks.run --compare benchmarks/baseline.json --threshold 0.2
+
+every benchmark reports throughput (items/s), p50/p95 latency (ms) and the peak rss (MB)
+of the process that ran it. each one runs in its own subprocess so peak rss is not
+polluted by the previous ones (--no-isolate runs everything in this process).
+fixtures: "synthetic" generates a csv of random synopses, "dataset" samples the first
+N rows of src/constants/dataset.csv; "full" means the whole fixture.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# tamanho do fixture sintetico "full", perto do dataset real
+SYNTHETIC_FULL = 16000
+WORDS = ("pirate king world magic village war friend dragon ninja space robot girl boy power sword school demon "
+         "battle love hero journey tournament ancient kingdom school club detective mystery idol music mecha "
+         "spirit curse family revenge island treasure captain empire rebellion alchemist witch").split()
+
+
+def peak_rss_mb() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux devolve em KB, macOS em bytes
+    return usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024
+
+
+def summarize(latencies: List[float], items_per_run: int) -> dict:
+    latencies = np.asarray(latencies, dtype=np.float64)
+    return {
+        "runs": int(len(latencies)),
+        "items": items_per_run,
+        "throughput": float(items_per_run / np.median(latencies)) if len(latencies) and np.median(latencies) > 0 else None,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+    }
+
+
+def timed(fn: Callable, repeat: int) -> List[float]:
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+# fixtures -----------------------------------------------------------------
+
+def make_synthetic_csv(path: Path, rows: int, seed: int = 0) -> Path:
+    """csv with the dataset columns and random synopses (with some html, like the real one)"""
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(40, 160, size=rows)
+    synopses = []
+    for i, length in enumerate(lengths):
+        text = " ".join(WORDS[j] for j in rng.integers(0, len(WORDS), size=length))
+        synopses.append(text + (" <br><i>(Source: ANN)</i>" if i % 4 == 0 else ""))
+    pd.DataFrame({
+        "anime_id": np.arange(1, rows + 1),
+        "Name": [f"Anime {i}" for i in range(rows)],
+        "Score": rng.integers(1, 10, size=rows),
+        "Genres": "Action",
+        "sypnopsis": synopses,
+    }).to_csv(path, index=False)
+    return path
+
+
+def make_fixture(kind: str, size: str, workdir: Path) -> Optional[Path]:
+    """csv path of the fixture, None when the dataset fixture is asked for but there is no dataset"""
+    if kind == "synthetic":
+        rows = SYNTHETIC_FULL if size == "full" else int(size)
+        path = workdir / f"synthetic-{rows}.csv"
+        return path if path.exists() else make_synthetic_csv(path, rows)
+    dataset = ROOT / "src" / "constants" / "dataset.csv"
+    if not dataset.exists():
+        return None
+    if size == "full":
+        return dataset
+    import pandas as pd
+    path = workdir / f"dataset-{size}.csv"
+    if not path.exists():
+        pd.read_csv(dataset, nrows=int(size)).to_csv(path, index=False)
+    return path
+
+
+# benchmarks ---------------------------------------------------------------
+
+def _load_texts(csv_path: Path) -> List[str]:
+    from src.constants.cleaner import get_all_synopses
+    return [entry["synopsis"] for entry in get_all_synopses(str(csv_path), limit=None)]
+
+
+def _fitted(csv_path: Path):
+    from src.transformer.transformer import Transformer
+    transformer = Transformer()
+    docs = transformer.preprocess_many(_load_texts(csv_path), workers=1)
+    transformer.fit(docs)
+    transformer.build_inverted_index()
+    return transformer, docs
+
+
+def _queries(docs: List[List[str]], count: int = 200) -> List[List[str]]:
+    rows = np.random.default_rng(1).choice(len(docs), size=min(count, len(docs)), replace=False)
+    return [docs[row] for row in rows]
+
+
+def bench_get_all_synopses(csv_path: Path, repeat: int) -> dict:
+    from src.constants.cleaner import get_all_synopses
+    rows = len(get_all_synopses(str(csv_path), limit=None))
+    return summarize(timed(lambda: get_all_synopses(str(csv_path), limit=None), repeat), rows)
+
+
+def bench_preprocess(csv_path: Path, repeat: int) -> dict:
+    from src.transformer.transformer import Transformer
+    texts = _load_texts(csv_path)
+    transformer = Transformer()
+
+    async def run():
+        per_doc = []
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for text in texts:
+                doc_start = time.perf_counter()
+                await transformer.preprocess(text)
+                per_doc.append(time.perf_counter() - doc_start)
+        total = time.perf_counter() - start
+        await transformer.close_client()
+        return per_doc, total
+
+    per_doc, total = asyncio.run(run())
+    result = summarize(per_doc, 1)
+    result["items"] = len(texts)
+    result["throughput"] = len(texts) * repeat / total
+    return result
+
+
+def bench_transform(csv_path: Path, repeat: int) -> dict:
+    from src.transformer.transformer import Transformer
+    transformer = Transformer()
+    docs = transformer.preprocess_many(_load_texts(csv_path), workers=1)
+    latencies = timed(lambda: asyncio.run(transformer.transform(docs)), repeat)
+    asyncio.run(transformer.close_client())
+    return summarize(latencies, len(docs))
+
+
+def _bench_queries(csv_path: Path, repeat: int, query_fn) -> dict:
+    transformer, docs = _fitted(csv_path)
+    vectors = [transformer.transform_query(tokens) for tokens in _queries(docs)]
+    latencies = []
+    for _ in range(repeat):
+        for vec in vectors:
+            start = time.perf_counter()
+            query_fn(transformer, vec)
+            latencies.append(time.perf_counter() - start)
+    asyncio.run(transformer.close_client())
+    result = summarize(latencies, 1)
+    result["documents"] = len(docs)
+    return result
+
+
+def bench_similarities(csv_path: Path, repeat: int) -> dict:
+    return _bench_queries(csv_path, repeat, lambda transformer, vec: transformer.similarities(vec))
+
+
+def bench_top_k(csv_path: Path, repeat: int) -> dict:
+    return _bench_queries(csv_path, repeat, lambda transformer, vec: transformer.top_k(vec, k=10))
+
+
+def bench_top_k_bruteforce(csv_path: Path, repeat: int) -> dict:
+    return _bench_queries(csv_path, repeat, lambda transformer, vec: transformer.top_k(vec, k=10, matrix=transformer.matrix))
+
+
+def _mock_clients(url: str):
+    from src.api.anilist import AniListClient
+    from src.api.anizip import AniZipClient
+    from src.api.client import APIClient
+
+    # mesmos clients, apontando pro mock, sem cache e sem o limite de 90 req/min da anilist
+    class MockAniList(AniListClient):
+        rate_limit = None
+
+        def __init__(self):
+            APIClient.__init__(self, url, cache=False)
+
+    class MockAniZip(AniZipClient):
+        def __init__(self):
+            APIClient.__init__(self, url + "/mappings", cache=False)
+
+    return MockAniList(), MockAniZip()
+
+
+def _bench_api(requests: int, call) -> dict:
+    from benchmarks.mock_api import MockAPIServer
+    from src.api.pool import close_pool
+
+    async def run(url: str):
+        anilist, anizip = _mock_clients(url)
+        try:
+            return await call(anilist, anizip, requests)
+        finally:
+            await asyncio.gather(anilist.close(), anizip.close())
+            await close_pool()
+
+    with MockAPIServer() as server:
+        return asyncio.run(run(server.url))
+
+
+async def _sequential(requests: int, fetch) -> dict:
+    latencies = []
+    for anilist_id in range(1, requests + 1):
+        start = time.perf_counter()
+        await fetch(anilist_id)
+        latencies.append(time.perf_counter() - start)
+    result = summarize(latencies, 1)
+    result["throughput"] = requests / sum(latencies)
+    return result
+
+
+def bench_anilist_get_by_id(requests: int) -> dict:
+    return _bench_api(requests, lambda anilist, anizip, n: _sequential(n, anilist.get_by_id))
+
+
+def bench_anizip_get_mappings(requests: int) -> dict:
+    return _bench_api(requests, lambda anilist, anizip, n: _sequential(n, anizip.get_mappings))
+
+
+def bench_anilist_get_by_ids(requests: int) -> dict:
+    async def call(anilist, anizip, n):
+        start = time.perf_counter()
+        await anilist.get_by_ids(range(1, n + 1))
+        return summarize([time.perf_counter() - start], n)
+    return _bench_api(requests, call)
+
+
+# benchmarks do pipeline rodam por fixture/tamanho, os de api contra o mock com --api-requests requests
+PIPELINE_BENCHMARKS: Dict[str, Callable] = {
+    "get_all_synopses": bench_get_all_synopses,
+    "preprocess": bench_preprocess,
+    "transform": bench_transform,
+    "similarities": bench_similarities,
+    "top_k": bench_top_k,
+    "top_k_bruteforce": bench_top_k_bruteforce,
+}
+API_BENCHMARKS: Dict[str, Callable] = {
+    "anilist_get_by_id": bench_anilist_get_by_id,
+    "anilist_get_by_ids": bench_anilist_get_by_ids,
+    "anizip_get_mappings": bench_anizip_get_mappings,
+}
+
+
+def run_one(name: str, fixture: Optional[str], size: Optional[str], repeat: int, api_requests: int, workdir: Path) -> dict:
+    """run a single benchmark in this process and return its result row"""
+    row = {"name": name, "fixture": fixture, "size": size}
+    if name in API_BENCHMARKS:
+        row.update(API_BENCHMARKS[name](api_requests))
+    else:
+        csv_path = make_fixture(fixture, size, workdir)
+        if csv_path is None:
+            row["skipped"] = "src/constants/dataset.csv not found"
+            return row
+        row.update(PIPELINE_BENCHMARKS[name](csv_path, repeat))
+    row["peak_rss_mb"] = peak_rss_mb()
+    return row
+
+
+def run_isolated(name: str, fixture: Optional[str], size: Optional[str], repeat: int, api_requests: int, workdir: Path) -> dict:
+    command = [sys.executable, "-m", "benchmarks.run", "--single", name, "--repeat", str(repeat),
+               "--api-requests", str(api_requests), "--workdir", str(workdir)]
+    if fixture is not None:
+        command += ["--fixtures", fixture, "--sizes", size]
+    done = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    lines = [line for line in done.stdout.splitlines() if line.startswith("{")]
+    if done.returncode != 0 or not lines:
+        return {"name": name, "fixture": fixture, "size": size, "error": done.stderr.strip().splitlines()[-1:] or "failed"}
+    return json.loads(lines[-1])
+
+
+def result_key(row: dict) -> str:
+    return row["name"] if row.get("fixture") is None else f"{row['name']}[{row['fixture']}:{row['size']}]"
+
+
+def compare(results: List[dict], baseline: List[dict], threshold: float) -> List[str]:
+    """
+    regressions against the baseline: throughput lower, or p95 latency / peak rss higher,
+    by more than `threshold` (a fraction) for the same benchmark, fixture and size.
+    """
+    base = {result_key(row): row for row in baseline}
+    regressions = []
+    for row in results:
+        old = base.get(result_key(row))
+        if old is None or "throughput" not in row or "throughput" not in old:
+            continue
+        checks = (("throughput", -1), ("p95_ms", 1), ("peak_rss_mb", 1))
+        for metric, direction in checks:
+            new_value, old_value = row.get(metric), old.get(metric)
+            if not new_value or not old_value:
+                continue
+            change = (new_value - old_value) / old_value
+            if change * direction > threshold:
+                regressions.append(f"{result_key(row)}: {metric} {old_value:.4g} -> {new_value:.4g} ({change:+.0%})")
+    return regressions
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="Kori benchmark suite")
+    parser.add_argument("--sizes", default="500,5000,full", help="comma separated fixture sizes (a number or 'full')")
+    parser.add_argument("--fixtures", default="synthetic,dataset", help="synthetic and/or dataset")
+    parser.add_argument("--only", default=None, help="comma separated benchmark names")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark (queries: passes over the query set)")
+    parser.add_argument("--api-requests", type=int, default=200, help="requests per api benchmark")
+    parser.add_argument("--out", default=None, help="write the results json here (e.g. a baseline)")
+    parser.add_argument("--compare", default=None, help="baseline json to compare against, exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative change before flagging (0.2 = 20%%)")
+    parser.add_argument("--no-isolate", action="store_true", help="run every benchmark in this process")
+    parser.add_argument("--workdir", default=None, help="where fixtures are generated (default: a temp dir)")
+    parser.add_argument("--single", default=None, help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    sizes = [size.strip() for size in args.sizes.split(",") if size.strip()]
+    fixtures = [fixture.strip() for fixture in args.fixtures.split(",") if fixture.strip()]
+    with tempfile.TemporaryDirectory(prefix="kori-bench-") as tmp:
+        workdir = Path(args.workdir) if args.workdir else Path(tmp)
+        workdir.mkdir(parents=True, exist_ok=True)
+        if args.single:
+            # modo interno do run_isolated: um benchmark, uma linha de json
+            fixture = fixtures[0] if args.single in PIPELINE_BENCHMARKS else None
+            size = sizes[0] if fixture is not None else None
+            print(json.dumps(run_one(args.single, fixture, size, args.repeat, args.api_requests, workdir)))
+            return 0
+
+        names = list(PIPELINE_BENCHMARKS) + list(API_BENCHMARKS)
+        if args.only:
+            wanted = {name.strip() for name in args.only.split(",")}
+            unknown = wanted - set(names)
+            if unknown:
+                print(f"❌ Unknown benchmarks: {', '.join(sorted(unknown))}", file=sys.stderr)
+                return 2
+            names = [name for name in names if name in wanted]
+        runner = run_one if args.no_isolate else run_isolated
+        jobs = [(name, fixture, size) for name in names if name in PIPELINE_BENCHMARKS
+                for fixture in fixtures for size in sizes]
+        jobs += [(name, None, None) for name in names if name in API_BENCHMARKS]
+        results = []
+        for name, fixture, size in jobs:
+            print(f"⏱️  {name} {fixture or ''} {size or ''}".rstrip(), file=sys.stderr, flush=True)
+            results.append(runner(name, fixture, size, args.repeat, args.api_requests, workdir))
+
+    report = {
+        "meta": {
+            "created_at": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "isolated": not args.no_isolate,
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"⚠️ Regression: {line}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"✅ No regressions above {args.threshold:.0%} against {args.compare}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+startup budget check, from the repository root:
+
+    python -m benchmarks.startup                  # fails (exit 1) above the 200 ms budget
+    python -m benchmarks.startup --budget-ms 150 --runs 7 --top 15
+
+measures the wall time from launching `python main.py` to the first prompt showing up,
+and with `python -X importtime -c "import main"` which modules make up the import time.
+it also fails when one of the deferred modules (numpy, pandas, httpx, the transformer and
+with it the stopwords) is imported by main.py at startup.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+FIRST_PROMPT = "Digite o nome do anime".encode("utf-8")
+# so devem ser importados quando a busca / os similares precisam deles
+DEFERRED_MODULES = ("numpy", "pandas", "httpx", "nltk", "src.transformer.transformer", "src.api.client")
+
+
+def time_to_first_prompt(timeout: float = 30.0) -> float:
+    """seconds from spawning `python main.py` until the search prompt is written to stdout"""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "main.py"], cwd=ROOT, stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                               env=dict(os.environ, PYTHONUNBUFFERED="1"))
+    output = b""
+    try:
+        while FIRST_PROMPT not in output:
+            if time.perf_counter() - start > timeout:
+                raise TimeoutError(f"no prompt after {timeout:.0f}s")
+            chunk = process.stdout.read1(4096)
+            if not chunk:
+                raise RuntimeError("main.py exited before showing the prompt")
+            output += chunk
+        return time.perf_counter() - start
+    finally:
+        process.kill()
+        process.wait()
+
+
+def import_profile() -> List[dict]:
+    """-X importtime of `import main`: one entry per module, self and cumulative microseconds"""
+    done = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT,
+                          capture_output=True, text=True)
+    modules = []
+    for line in done.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append({"module": name.strip(), "self_us": int(self_us), "cumulative_us": int(cumulative_us)})
+    return modules
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description="Kori startup time budget")
+    parser.add_argument("--budget-ms", type=float, default=200.0, help="max median time to the first prompt")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports listed in the report")
+    args = parser.parse_args(argv)
+
+    times = [time_to_first_prompt() for _ in range(args.runs)]
+    modules = import_profile()
+    loaded = {entry["module"] for entry in modules}
+    main_import = next((entry["cumulative_us"] for entry in modules if entry["module"] == "main"), None)
+    report = {
+        "first_prompt_ms": {
+            "p50": float(np.percentile(times, 50) * 1000),
+            "p95": float(np.percentile(times, 95) * 1000),
+            "min": min(times) * 1000,
+        },
+        "import_main_ms": main_import / 1000 if main_import is not None else None,
+        "slowest_imports": sorted(modules, key=lambda entry: -entry["self_us"])[:args.top],
+        "deferred_but_loaded": [name for name in DEFERRED_MODULES if name in loaded],
+        "budget_ms": args.budget_ms,
+    }
+    print(json.dumps(report, indent=2))
+
+    failed = False
+    if report["first_prompt_ms"]["p50"] > args.budget_ms:
+        print(f"❌ First prompt after {report['first_prompt_ms']['p50']:.0f} ms, budget is {args.budget_ms:.0f} ms", file=sys.stderr)
+        failed = True
+    if report["deferred_but_loaded"]:
+        print(f"❌ Imported at startup: {', '.join(report['deferred_but_loaded'])}", file=sys.stderr)
+        failed = True
+    if not failed:
+        print(f"✅ First prompt in {report['first_prompt_ms']['p50']:.0f} ms (budget {args.budget_ms:.0f} ms)", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,11 @@
 from colorama import init, Fore, Style
 init(autoreset=True)
 import asyncio
+import sys
 import time
-from src.transformer.transformer import Transformer
-from src.api.anilist import AniListClient
-from src.api.anizip import AniZipClient
-from src.utils.remove_html_tags import remove_html_tags
+from typing import Optional
+# httpx, numpy e pandas so sao importados quando a busca / os similares precisam deles,
+# assim o menu aparece sem esperar esses imports
 
 def print_header(title, width=70):
     print(f"\n{Fore.CYAN}╔{'═' * (width-2)}{Fore.CYAN}╗{Style.RESET_ALL}")
@@ -49,6 +49,14 @@ async def main():
     except KeyboardInterrupt:
         print(f"\n{Fore.YELLOW}  ⚠️  Operação cancelada pelo usuário{Style.RESET_ALL}")
     finally:
+        await close_fitted_indexes()
+        if "src.api.pool" in sys.modules:
+            # so existe pool se algum client chegou a ser usado
+            await sys.modules["src.api.pool"].close_pool()
+        from src.utils import tracing
+        if tracing.is_enabled():
+            # KORI_TRACE=1 python main.py: onde foi o tempo dessa sessao
+            print(tracing.summary())
         bye = r''' /\_/\  
 ( o.o )  < bye bye!
  > ^ <
@@ -58,6 +66,9 @@ async def main():
 async def search_anime_api(title: str, limit: int = 10):
     """search animes in anilist by title, with interactive pagination."""
     import textwrap
+    from src.api.anilist import AniListClient
+    from src.utils.remove_html_tags import remove_html_tags
+
     client = AniListClient()
     page = 1
     
@@ -166,7 +177,8 @@ async def show_anime_details(anime):
         
         if acao == 's':
             selected_title = anime.get('title_romaji') or anime.get('title_english') or anime.get('title_native')
-            await show_similar_animes(selected_title, anime['id'])
+            title_variants = [anime.get('title_romaji'), anime.get('title_english'), anime.get('title_native')]
+            await show_similar_animes(selected_title, anime['id'], anime.get('id_mal'), title_variants)
             break
         elif acao == 'e':
             await show_anime_episodes(anime['id'])
@@ -179,6 +191,8 @@ async def show_anime_details(anime):
 
 async def show_anime_episodes(anilist_id: int):
     """search and show regular episodes of the anime by anilist_id using AniZipClient and extract_all_episodes_info."""
+    from src.api.anizip import AniZipClient
+
     client = AniZipClient()
     try:
         print_loading("Buscando episódios")
@@ -230,13 +244,36 @@ async def show_anime_episodes(anilist_id: int):
     finally:
         await client.close()
 
-async def show_similar_animes(selected_title: str, selected_id: int):
-    """show the most similar animes to the selected title using the Transformer."""
-    from src.transformer.transformer import Transformer
-    from src.constants.cleaner import get_all_synopses
+# indices ja carregados nesta sessao, por (csv, limite), pra nao reabrir a cada clique
+_fitted_indexes = {}
+
+async def get_fitted_index(csv_path: str, limit: Optional[int]):
+    """
+    return the CorpusIndex of the first `limit` dataset entries (all of them with None).
+    the binary index is built once (and rebuilt when the csv changes), then memory-mapped and kept warm.
+    """
+    from src.transformer.index import get_or_build_index
+
+    key = (csv_path, limit)
+    if key not in _fitted_indexes:
+        _fitted_indexes[key] = await get_or_build_index(csv_path, limit=limit)
+    return _fitted_indexes[key]
+
+async def close_fitted_indexes():
+    """close the api clients of the indexes kept warm by get_fitted_index"""
+    for index in _fitted_indexes.values():
+        await index.close()
+    _fitted_indexes.clear()
+
+async def show_similar_animes(selected_title: str, selected_id: int, selected_mal_id: int = None,
+                              title_variants: list = None):
+    """
+    show the most similar animes to the selected title using the Transformer.
+    the anime is located in the dataset through the title index (MAL id, or a unique title without one);
+    if it is there and the neighbour table was built with k >= 10, the precomputed list is used instead of
+    fetching and scoring it again, otherwise its row is left out of the results.
+    """
     from src.utils.path import get_dataset_csv_path
-    
-    transformer = Transformer()
 
     # configuração
     print_header2("⚙️ CONFIGURAÇÃO")
@@ -249,7 +286,7 @@ async def show_similar_animes(selected_title: str, selected_id: int):
     user_limit = input(f"\n{Fore.LIGHTYELLOW_EX}  ➤ Sua escolha: {Style.RESET_ALL}").strip().lower()
     
     if user_limit == "all":
-        MAX_DATASET = 9999999  # valor alto para garantir que pega tudo
+        MAX_DATASET = None  # sem limite, o mesmo indice do build-index / build-neighbors
         print(f"\n{Fore.RED}  ⚠️  AVISO: Comparando com TODO o dataset. Isso pode demorar bastante, dependendo do tamanho do arquivo!{Style.RESET_ALL}")
         time.sleep(2)
     else:
@@ -258,45 +295,38 @@ async def show_similar_animes(selected_title: str, selected_id: int):
         except Exception:
             MAX_DATASET = 500
     
-    print_loading(f"Analisando {MAX_DATASET} animes")
+    print_loading(f"Analisando {MAX_DATASET if MAX_DATASET is not None else 'todos os'} animes")
     
-    synopses_data = get_all_synopses(csv_path=get_dataset_csv_path(interactive=True), limit=MAX_DATASET)
-    anime_docs = []
-    titles = []
-    synopses = []
+    # o fit do dataset é feito uma vez só; aqui só vetoriza o anime escolhido
+    index = await get_fitted_index(get_dataset_csv_path(interactive=True), MAX_DATASET)
+    transformer = index.transformer
+    titles = index.titles
+    synopses = index.synopses
     
-    # prepara os docs, como handle_episodes ta false, e o dataset é gigantesco, usa apenas a sinopse. q ta no proprio csv e nao pesquisa nada na api
-    # pra evitar muitas chamadas desnecessarias e demorar mto
-    for entry in synopses_data:
-        titles.append(entry['title'])
-        synopses.append(entry['synopsis'])
-        doc_tokens = await transformer.create_doc(entry['anime_id'], entry['title'], handle_episodes=False, dataset_synopsis=entry['synopsis'])
-        anime_docs.append(doc_tokens)
-    
-    chosen_doc = await transformer.create_doc(selected_id, selected_title, handle_episodes=True)
-    
-    # aqui ele vetoriza tudo e calcula as similaridades usando o transformer
-    all_docs = [chosen_doc] + anime_docs
-    tfidf_matrix = await transformer.transform(all_docs)
-    base_vec = tfidf_matrix[0]
-    similarities = []
-    
-    for idx, vec in enumerate(tfidf_matrix[1:]):
-        sim = await transformer.cosine_similarity(base_vec, vec)
+    # acha o anime escolhido no dataset pelo id (ou pelos titulos), sem varrer a lista
+    selected_row = index.title_index.resolve(selected_id, selected_mal_id, title_variants or [selected_title])
+    k = 10
+    if selected_row is not None and index.neighbors is not None and index.neighbors.k >= k:
+        # o anime ja ta no dataset: lista pre-computada (build-neighbors), sem api nem calculo
+        similarities = index.neighbors.lookup_row(selected_row, k=k)
+        compared = len(titles) - 1
+    else:
+        chosen_doc = await transformer.create_doc(selected_id, selected_title, handle_episodes=True)
+        base_vec = transformer.transform_query(chosen_doc)
+        
         # remove o proprio anime escolhido da lista de similares
-        if titles[idx].strip().lower() != selected_title.strip().lower():
-            similarities.append((idx, sim))
-    
-    similarities.sort(key=lambda x: x[1], reverse=True)
+        excluded = [selected_row] if selected_row is not None else []
+        similarities = transformer.top_k(base_vec, k=k, exclude=excluded)
+        compared = len(titles) - len(excluded)
     print("\r" + " " * 80 + "\r", end='')
     
     # top 10 similares
-    top_n = min(10, len(similarities))
+    top_n = len(similarities)
     print_header(f"🎯 TOP {top_n} ANIMES SIMILARES")
-    print(f"{Fore.MAGENTA}  Comparados: {len(similarities)} animes de {len(synopses_data)}{Style.RESET_ALL}")
+    print(f"{Fore.MAGENTA}  Comparados: {compared} animes de {len(index)}{Style.RESET_ALL}")
     print_separator()
     
-    for rank, (idx, sim) in enumerate(similarities[:top_n], 1):
+    for rank, (idx, sim) in enumerate(similarities, 1):
         # nivel 
         if sim >= 0.1:
             nivel = f"{Fore.GREEN}●●●{Style.RESET_ALL} Alta - {Fore.MAGENTA}{sim*100:.1f}%{Style.RESET_ALL}"
@@ -315,7 +345,6 @@ async def show_similar_animes(selected_title: str, selected_id: int):
         print(f"      {Fore.LIGHTBLACK_EX}{synopsis_preview}{Style.RESET_ALL}")
     
     print()
-    await transformer.close_client()
 
 def print_welcome():
     ascii_art = r'''⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⢀⣤⣤⡀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⣀⣀⡀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
@@ -354,4 +383,8 @@ def print_welcome():
     print(f"{Fore.GREEN}🌌 Welcome to Kori! Your personal guide to the world of anime\n{Style.RESET_ALL}")
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # modo nao interativo: python main.py build-index ...
+        from src.cli import run
+        sys.exit(run(sys.argv[1:]))
     asyncio.run(main())
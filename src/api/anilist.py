@@ -1,17 +1,58 @@
 from unittest import result
+import asyncio
+from typing import Dict, Iterable, List, Optional
 from .client import APIClient
 
+# campos pedidos pra cada anime, iguais em search/get_by_id/get_by_ids
+MEDIA_FIELDS = """
+                    id
+                    idMal
+                    title {
+                        romaji
+                        english
+                        native
+                    }
+                    description(asHtml: false)
+                    episodes
+                    averageScore
+"""
+
+
+def normalize_media(anime: dict) -> dict:
+    """flatten an anilist Media object into the dict shape used across kori"""
+    return {
+        "id": anime["id"],
+        "id_mal": anime.get("idMal"),
+        "title_romaji": anime["title"]["romaji"],
+        "title_english": anime["title"]["english"],
+        "title_native": anime["title"]["native"],
+        "description": anime["description"],
+        "episodes": anime["episodes"],
+        "average_score": anime["averageScore"]
+    }
+
+
 class AniListClient(APIClient):
-    def __init__(self):
-        super().__init__("https://graphql.anilist.co")
+    # buscas mudam mais rapido que os dados de um anime especifico
+    cache_policies = {
+        "search": (60 * 60, 24 * 60 * 60),
+        "media": (24 * 60 * 60, 7 * 24 * 60 * 60),
+    }
+    # anilist anuncia 90 req/min; os headers X-RateLimit-* ajustam isso em tempo real
+    rate_limit = 90
+    # todas as chamadas sao graphql queries (leitura), entao repetir e seguro
+    retry_posts = True
 
-    async def query(self, query: str, variables: dict):
+    def __init__(self, cache=None):
+        super().__init__("https://graphql.anilist.co", cache=cache)
+
+    async def query(self, query: str, variables: dict, cache_as: str = None):
         """make a graphql query to the anilist api"""
         data = {
             "query": query,
             "variables": variables or {}
         }
-        return await self.post("", data=data)
+        return await self.post("", data=data, cache_as=cache_as)
     
     async def search(self, title: str, limit: int = 10, page: int = 1):
         """search for animes by title with pagination"""
@@ -25,17 +66,7 @@ class AniListClient(APIClient):
                     lastPage
                     hasNextPage
                 }
-                media(search: $search, type: ANIME) {
-                    id
-                    title {
-                        romaji
-                        english
-                        native
-                    }
-                    description(asHtml: false)
-                    episodes
-                    averageScore
-                }
+                media(search: $search, type: ANIME) {""" + MEDIA_FIELDS + """                }
             }
         }
         """
@@ -44,53 +75,62 @@ class AniListClient(APIClient):
             "page": page,
             "perPage": limit
         }
-        response = await self.query(query, variables)
+        response = await self.query(query, variables, cache_as="search")
         page_info = response.get("data", {}).get("Page", {}).get("pageInfo", {})
         total_pages = page_info.get("lastPage", 1)
         items = response.get("data", {}).get("Page", {}).get("media", [])
         single_results = []
         for anime in items:
-            single_results.append({
-                "id": anime["id"],
-                "title_romaji": anime["title"]["romaji"],
-                "title_english": anime["title"]["english"],
-                "title_native": anime["title"]["native"],
-                "description": anime["description"],
-                "episodes": anime["episodes"],
-                "average_score": anime["averageScore"]
-            })
+            single_results.append(normalize_media(anime))
         return single_results, total_pages
     
     async def get_by_id(self, anilist_id: int):
         """fetch anime info by AniList ID"""
         query = """
         query ($id: Int) {
-            Media(id: $id, type: ANIME) {
-                id
-                title {
-                    romaji
-                    english
-                    native
-                }
-                description(asHtml: false)
-                episodes
-                averageScore
-            }
+            Media(id: $id, type: ANIME) {""" + MEDIA_FIELDS + """            }
         }
         """
         variables = {"id": anilist_id}
-        response = await self.query(query, variables)
+        response = await self.query(query, variables, cache_as="media")
         anime = response.get("data", {}).get("Media", {})
         if not anime:
             return None
-        return {
-            "id": anime["id"],
-            "title_romaji": anime["title"]["romaji"],
-            "title_english": anime["title"]["english"],
-            "title_native": anime["title"]["native"],
-            "description": anime["description"],
-            "episodes": anime["episodes"],
-            "average_score": anime["averageScore"]
+        return normalize_media(anime)
+
+    async def get_by_ids(self, anilist_ids: Iterable[int], per_page: int = 50) -> Dict[int, Optional[dict]]:
+        """
+        fetch many animes with one Page(media(id_in: ...)) query per `per_page` ids (50 is anilist's max).
+        returns {id: anime dict as in get_by_id}; ids anilist does not know map to None,
+        so callers can negative-cache them.
+        """
+        ids = list(dict.fromkeys(int(i) for i in anilist_ids))
+        chunks = [ids[i:i + per_page] for i in range(0, len(ids), per_page)]
+        found = {}
+        for media in await asyncio.gather(*(self._fetch_id_chunk(chunk, per_page) for chunk in chunks)):
+            for anime in media:
+                found[anime["id"]] = anime
+        return {anilist_id: found.get(anilist_id) for anilist_id in ids}
+
+    async def _fetch_id_chunk(self, ids: List[int], per_page: int) -> List[dict]:
+        query = """
+        query ($ids: [Int], $page: Int, $perPage: Int) {
+            Page(page: $page, perPage: $perPage) {
+                pageInfo {
+                    hasNextPage
+                }
+                media(id_in: $ids, type: ANIME) {""" + MEDIA_FIELDS + """                }
+            }
         }
-    
+        """
+        results = []
+        page = 1
+        while True:
+            variables = {"ids": ids, "page": page, "perPage": per_page}
+            response = await self.query(query, variables, cache_as="media")
+            data = (response.get("data") or {}).get("Page") or {}
+            results.extend(normalize_media(anime) for anime in data.get("media") or [])
+            if not (data.get("pageInfo") or {}).get("hasNextPage"):
+                return results
+            page += 1
 
@@ -1,13 +1,17 @@
 from .client import APIClient
 
 class AniZipClient(APIClient):
-    def __init__(self):
-        super().__init__("https://api.ani.zip/mappings")
+    cache_policies = {
+        "mappings": (24 * 60 * 60, 7 * 24 * 60 * 60),
+    }
+
+    def __init__(self, cache=None):
+        super().__init__("https://api.ani.zip/mappings", cache=cache)
 
     async def get_mappings(self, anilist_id: int):
         """get ani.zip mappings for a given anilist id"""
 
-        response = await self.get("", params={"anilist_id": anilist_id})
+        response = await self.get("", params={"anilist_id": anilist_id}, cache_as="mappings")
         return response
     
     def is_regular_episode(self, episode_key: str) -> bool:
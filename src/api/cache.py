@@ -0,0 +1,168 @@
+import atexit
+import contextlib
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+
+def _cache_dir() -> Path:
+    return Path(__file__).parent.parent / "constants" / "cache"
+
+
+def make_key(method: str, url: str, payload: Any) -> str:
+    """stable key for a request: method + full url + params/body"""
+    raw = json.dumps([method.upper(), url, payload], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# leituras guardam o last_access em memoria e gravam de uma vez a cada tantas (ou no proximo set)
+TOUCH_BATCH = 256
+
+
+class ResponseCache:
+    """
+    persistent cache of parsed api responses in a sqlite file.
+    entries carry their own expiry; the cache keeps the total stored size under max_bytes
+    by evicting the least recently used entries. reads never write: their access times are
+    batched in memory and flushed with the next set(), every TOUCH_BATCH reads, or on close().
+    the total size is kept in the cache_meta table, updated in the same transaction as the entries.
+    """
+
+    def __init__(self, path: Optional[Path] = None, max_bytes: int = 64 * 1024 * 1024):
+        if path is None:
+            path = _cache_dir() / "http-cache.sqlite"
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " stored_at REAL NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses(last_access)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache_meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        # arquivos de antes do cache_meta: soma uma vez so, depois o total e mantido a cada escrita
+        self._conn.execute("INSERT OR IGNORE INTO cache_meta (name, value)"
+                           " SELECT 'total_bytes', COALESCE(SUM(size), 0) FROM responses")
+        self._conn.commit()
+        self._touched = {}  # key -> last_access ainda nao gravado
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """return (value, expires_at) or None, and mark the entry as recently used"""
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._touched[key] = time.time()
+            if len(self._touched) >= TOUCH_BATCH:
+                self._flush_touched()
+                self._conn.commit()
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any, ttl: float):
+        raw = json.dumps(value, separators=(",", ":"))
+        now = time.time()
+        with self._lock, self._write():
+            self._flush_touched()
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, stored_at, expires_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, raw, len(raw), now, now + ttl, now),
+            )
+            self._touched.pop(key, None)
+            self._add_bytes(len(raw) - (old[0] if old else 0))
+            self._evict()
+
+    @contextlib.contextmanager
+    def _write(self):
+        # BEGIN IMMEDIATE: outro processo nao escreve entre ler o tamanho antigo e atualizar o total
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.rollback()
+            raise
+        self._conn.commit()
+
+    def flush(self):
+        """write the access times of the entries read since the last write"""
+        with self._lock:
+            if self._touched:
+                self._flush_touched()
+                self._conn.commit()
+
+    def _flush_touched(self):
+        if self._touched:
+            self._conn.executemany("UPDATE responses SET last_access = ? WHERE key = ?",
+                                   [(at, key) for key, at in self._touched.items()])
+            self._touched.clear()
+
+    def _add_bytes(self, delta: int):
+        if delta:
+            self._conn.execute("UPDATE cache_meta SET value = value + ? WHERE name = 'total_bytes'", (delta,))
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT value FROM cache_meta WHERE name = 'total_bytes'").fetchone()[0]
+
+    def _evict(self):
+        total = self._conn.execute("SELECT value FROM cache_meta WHERE name = 'total_bytes'").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        doomed = []
+        freed = 0
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC"):
+            if total - freed <= self.max_bytes:
+                break
+            doomed.append((key,))
+            freed += size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self._add_bytes(-freed)
+
+    def delete(self, key: str):
+        with self._lock, self._write():
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if old is not None:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._add_bytes(-old[0])
+            self._touched.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.execute("UPDATE cache_meta SET value = 0 WHERE name = 'total_bytes'")
+            self._touched.clear()
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            try:
+                self._flush_touched()
+                self._conn.commit()
+            finally:
+                self._conn.close()
+
+
+_default_cache: Optional[ResponseCache] = None
+
+
+def get_default_cache() -> ResponseCache:
+    """the process wide cache shared by every api client"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResponseCache()
+        # grava os last_access pendentes na saida
+        atexit.register(_default_cache.flush)
+    return _default_cache
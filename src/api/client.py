@@ -1,24 +1,178 @@
 import httpx
 import asyncio
+import time
+from typing import Optional, Union
+from .cache import ResponseCache, get_default_cache, make_key
+from .pool import get_client
+from .ratelimit import CircuitOpenError, backoff_delay, get_breaker, get_limiter, parse_retry_after
+from src.utils import tracing
+
+# requests em andamento, por chave (metodo + url + params/body), compartilhadas entre todos os clients
+_inflight: dict = {}
+# falhas do lado da api (rede, status de erro, breaker aberto), pra nao engolir bug de codigo junto
+UPSTREAM_ERRORS = (httpx.HTTPError, CircuitOpenError)
 
 class APIClient:
     """initializes client for making api requests"""
-    def __init__(self, base_url: str):
+
+    # politica de cache por endpoint: nome -> (ttl, stale_while_revalidate) em segundos
+    # requests sem `cache_as` ou com nome fora daqui nao sao cacheadas
+    cache_policies: dict = {}
+    # limite inicial em requests por minuto (None = sem limite ate o servidor mandar X-RateLimit-*)
+    rate_limit: Optional[float] = None
+    max_retries: int = 4
+    # POSTs so sao repetidos quando a api usa POST apenas pra leitura (ex: graphql queries)
+    retry_posts: bool = False
+
+    def __init__(self, base_url: str, cache: Union[ResponseCache, bool, None] = None):
+        """cache=None uses the shared on-disk cache, False disables it, or pass a ResponseCache"""
         self.base_url = base_url
-        self.client = httpx.AsyncClient(base_url=self.base_url)
+        self._url = httpx.URL(base_url)
+        if cache is None or cache is True:
+            cache = get_default_cache()
+        self.cache = cache if isinstance(cache, ResponseCache) else None
+        self._revalidations = set()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """the shared pooled client (see pool.get_client), not owned by this api client"""
+        return get_client()
+
+    def _full_url(self, endpoint: str) -> str:
+        # mesma regra do base_url do httpx: base com "/" no fim + endpoint sem "/" no comeco
+        return self.base_url.rstrip("/") + "/" + endpoint.lstrip("/")
+
+    async def get(self, endpoint: str, params: dict, cache_as: Optional[str] = None):
+        return await self._cached("GET", endpoint, params, cache_as)
+
+    async def post(self, endpoint: str, data: dict, cache_as: Optional[str] = None):
+        return await self._cached("POST", endpoint, data, cache_as)
+
+    async def _send(self, method: str, endpoint: str, payload: dict):
+        """
+        send one request through the host's token bucket and circuit breaker.
+        idempotent requests are retried on transport errors, 429 and 5xx with jittered
+        exponential backoff, or after Retry-After when the server sends it.
+        """
+        host = self._url.host
+        limiter = get_limiter(host, self.rate_limit / 60.0 if self.rate_limit else None)
+        breaker = get_breaker(host)
+        attempts = self.max_retries + 1 if (method == "GET" or self.retry_posts) else 1
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            breaker.before_request(host)
+            with tracing.span("api.rate_limit_wait", host=host):
+                await limiter.acquire()
+            if attempt:
+                tracing.count("api.retries")
+            try:
+                with tracing.span("api.request", host=host, method=method, attempt=attempt) as request_span:
+                    if method == "GET":
+                        response = await self.client.get(self._full_url(endpoint), params=payload)
+                    else:
+                        response = await self.client.post(self._full_url(endpoint), json=payload)
+                    request_span.set(status=response.status_code, bytes=len(response.content))
+                tracing.count("api.requests")
+                tracing.count("api.bytes", len(response.content))
+            except httpx.TransportError:
+                tracing.count("api.transport_errors")
+                breaker.record_failure()
+                if last_attempt:
+                    raise
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+            limiter.update_from_headers(response.headers)
+            if response.status_code == 429 or response.status_code >= 500:
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if response.status_code == 429:
+                    # rate limit nao e falha do host, so segura o bucket ate liberar
+                    limiter.pause(retry_after if retry_after is not None else backoff_delay(attempt))
+                else:
+                    breaker.record_failure()
+                if last_attempt:
+                    response.raise_for_status()
+                if response.status_code != 429:
+                    await asyncio.sleep(retry_after if retry_after is not None else backoff_delay(attempt))
+                continue
+            breaker.record_success()
+            response.raise_for_status()
+            return response.json()
 
-    async def get(self, endpoint: str, params: dict):
-        response = await self.client.get(endpoint, params=params)
-        response.raise_for_status()
-        return response.json()
+    async def _fetch(self, method: str, endpoint: str, payload: dict, key: Optional[str] = None, ttl: Optional[float] = None):
+        """
+        single-flight network fetch: concurrent identical requests (same method, url and
+        params/body) share one http call and all get the same parsed result.
+        every caller that passes a ttl gets the response stored in its cache, also when it
+        joined a flight started by a caller without one; each cache is written once per flight.
+        """
+        key = key or make_key(method, self.base_url + endpoint, payload)
+        flight = _inflight.get(key)
+        if flight is not None:
+            tracing.count("api.inflight_shared")
+            task, written = flight
+        else:
+            written = []  # caches que ja receberam essa resposta
 
-    async def post(self, endpoint: str, data: dict):
-        response = await self.client.post(endpoint, json=data)
-        response.raise_for_status()
-        return response.json()
+            async def send():
+                value = await self._send(method, endpoint, payload)
+                if ttl is not None:
+                    self.cache.set(key, value, ttl)
+                    written.append(self.cache)
+                return value
+
+            task = asyncio.ensure_future(send())
+            _inflight[key] = (task, written)
+
+            def done(finished):
+                if _inflight.get(key, (None,))[0] is finished:
+                    del _inflight[key]
+            task.add_done_callback(done)
+        # shield: se quem esta esperando for cancelado, os outros continuam recebendo a resposta
+        value = await asyncio.shield(task)
+        if ttl is not None and not any(cache is self.cache for cache in written):
+            self.cache.set(key, value, ttl)
+            written.append(self.cache)
+        return value
+
+    async def _cached(self, method: str, endpoint: str, payload: dict, cache_as: Optional[str]):
+        """
+        serve from the cache when the entry is fresh; when it expired less than
+        stale_while_revalidate seconds ago, serve it anyway and refresh it in the background.
+        """
+        policy = self.cache_policies.get(cache_as) if self.cache is not None else None
+        if policy is None:
+            return await self._fetch(method, endpoint, payload)
+        ttl, stale = policy
+        key = make_key(method, self.base_url + endpoint, payload)
+        entry = self.cache.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            now = time.time()
+            if now < expires_at:
+                tracing.count("api.cache.hit")
+                return value
+            if now < expires_at + stale:
+                tracing.count("api.cache.stale")
+                self._revalidate(key, ttl, method, endpoint, payload)
+                return value
+        tracing.count("api.cache.miss")
+        return await self._fetch(method, endpoint, payload, key=key, ttl=ttl)
+
+    def _revalidate(self, key: str, ttl: float, method: str, endpoint: str, payload: dict):
+        async def refresh():
+            try:
+                await self._fetch(method, endpoint, payload, key=key, ttl=ttl)
+            except Exception:
+                pass  # fica com a entrada velha, tenta de novo no proximo acesso
+
+        task = asyncio.create_task(refresh())
+        self._revalidations.add(task)
+        task.add_done_callback(self._revalidations.discard)
 
     async def close(self):
-        await self.client.aclose()
+        """wait for background revalidations; the pooled connections stay open for other clients"""
+        if self._revalidations:
+            await asyncio.gather(*self._revalidations, return_exceptions=True)
 
 
 class APIManager:
@@ -26,7 +180,7 @@ class APIManager:
     def __init__(self):
         from .anilist import AniListClient
         from .anizip import AniZipClient
-        
+
         self.anilist = AniListClient()
         self.anizip = AniZipClient()
 
@@ -35,5 +189,3 @@ class APIManager:
             self.anilist.close(),
             self.anizip.close()
         )
-
-
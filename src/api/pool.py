@@ -0,0 +1,102 @@
+import asyncio
+import weakref
+import httpx
+
+# configuracao do pool compartilhado, mude com configure_pool() antes do primeiro request
+_settings = {
+    "max_connections": 20,
+    "max_keepalive_connections": 10,
+    "keepalive_expiry": 30.0,
+    "connect_timeout": 5.0,
+    "read_timeout": 20.0,
+    "write_timeout": 10.0,
+    "pool_timeout": 10.0,
+    "http2": False,
+}
+# um AsyncClient por event loop: conexoes abertas num loop nao servem em outro (cada asyncio.run cria um)
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_stats = {"requests": 0, "connections": 0, "tls_handshakes": 0}
+
+
+def configure_pool(**settings):
+    """
+    change the shared pool settings (any key of the defaults above, e.g. max_connections=50, http2=True).
+    clients already created keep their settings; call close_pool() first to apply them everywhere.
+    """
+    unknown = set(settings) - set(_settings)
+    if unknown:
+        raise ValueError(f"unknown pool settings: {', '.join(sorted(unknown))}")
+    _settings.update(settings)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+async def _trace(event: str, info: dict):
+    # eventos do httpcore: conexao nova, handshake tls, request enviado
+    if event == "connection.connect_tcp.complete":
+        _stats["connections"] += 1
+    elif event == "connection.start_tls.complete":
+        _stats["tls_handshakes"] += 1
+    elif event in ("http11.send_request_headers.started", "http2.send_request_headers.started"):
+        _stats["requests"] += 1
+
+
+class _TracedTransport(httpx.AsyncHTTPTransport):
+    """the default transport, with the connection-reuse counters hooked into every request"""
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.extensions.setdefault("trace", _trace)
+        return await super().handle_async_request(request)
+
+
+def _new_client() -> httpx.AsyncClient:
+    http2 = _settings["http2"]
+    if http2 and not _http2_available():
+        print("⚠️ HTTP/2 needs the 'h2' package (pip install 'httpx[http2]'), using HTTP/1.1")
+        http2 = False
+    limits = httpx.Limits(max_connections=_settings["max_connections"],
+                          max_keepalive_connections=_settings["max_keepalive_connections"],
+                          keepalive_expiry=_settings["keepalive_expiry"])
+    timeout = httpx.Timeout(connect=_settings["connect_timeout"], read=_settings["read_timeout"],
+                            write=_settings["write_timeout"], pool=_settings["pool_timeout"])
+    return httpx.AsyncClient(transport=_TracedTransport(limits=limits, http2=http2), timeout=timeout)
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    the process-wide pooled AsyncClient of the running event loop: keep-alive connections,
+    connection limits and timeouts from configure_pool(). every api client sends through it,
+    so a session reuses the same tcp / tls connections instead of opening one pool per client.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = _clients[loop] = _new_client()
+    return client
+
+
+async def close_pool():
+    """close the pooled client of the running event loop (api clients only ever borrow it)"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def pool_stats() -> dict:
+    """requests sent, connections opened and how many requests reused an open connection"""
+    requests = _stats["requests"]
+    reused = max(requests - _stats["connections"], 0)
+    return {
+        "requests": requests,
+        "connections_opened": _stats["connections"],
+        "tls_handshakes": _stats["tls_handshakes"],
+        "reused": reused,
+        "reuse_ratio": reused / requests if requests else 0.0,
+        "http2": bool(_settings["http2"] and _http2_available()),
+    }
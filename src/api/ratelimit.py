@@ -0,0 +1,155 @@
+import asyncio
+import email.utils
+import random
+import time
+from typing import Optional
+
+
+class CircuitOpenError(Exception):
+    """raised instead of sending a request while a host's circuit breaker is open"""
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """exponential backoff with full jitter: uniform(0, min(cap, base * 2^attempt))"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After header in seconds, it can be either a number of seconds or an http date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class TokenBucket:
+    """
+    client side rate limiter. refills `rate` tokens per second up to `capacity`;
+    rate=None means unlimited until the server tells us its limits through X-RateLimit-* headers.
+    """
+
+    def __init__(self, rate: Optional[float] = None, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else (rate or 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """
+        wait for a token. tokens are reserved before sleeping (the balance may go negative),
+        so concurrent callers queue up without needing a lock.
+        """
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            if not self.rate:
+                return
+            self._refill(now)
+            self.tokens -= 1
+            if self.tokens < 0:
+                await asyncio.sleep(-self.tokens / self.rate)
+            return
+
+    def pause(self, seconds: float):
+        """stop handing out tokens for `seconds` (e.g. after a 429 with Retry-After)"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers):
+        """
+        adapt to X-RateLimit-Limit (requests per minute) and X-RateLimit-Remaining,
+        and honour X-RateLimit-Reset (unix time) when the server says we are out of requests.
+        """
+        limit = headers.get("X-RateLimit-Limit")
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        try:
+            if limit is not None:
+                per_minute = float(limit)
+                if per_minute > 0:
+                    self._refill(time.monotonic())
+                    self.rate = per_minute / 60.0
+                    # rajada pequena: mantem o ritmo sustentado em vez de gastar tudo de uma vez
+                    self.capacity = max(1.0, min(per_minute / 10.0, 10.0))
+            if remaining is not None:
+                self.tokens = min(self.tokens, float(remaining))
+                if float(remaining) <= 0 and reset is not None:
+                    self.pause(float(reset) - time.time())
+        except ValueError:
+            pass
+
+
+class CircuitBreaker:
+    """
+    per host breaker: after `failure_threshold` consecutive failures requests fail fast
+    for `reset_timeout` seconds, then one trial request decides whether it closes again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_started: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def _trial_running(self) -> bool:
+        # um trial que nunca terminou (ex: cancelado) expira junto com o reset_timeout
+        return self._trial_started is not None and time.monotonic() - self._trial_started < self.reset_timeout
+
+    def before_request(self, host: str = ""):
+        state = self.state
+        if state == "open" or (state == "half-open" and self._trial_running()):
+            raise CircuitOpenError(f"circuit open for {host or 'host'}, failing fast")
+        if state == "half-open":
+            self._trial_started = time.monotonic()
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_started = None
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_started = None
+        if self.failures >= self.failure_threshold or self.opened_at is not None:
+            self.opened_at = time.monotonic()
+
+
+_limiters: dict = {}
+_breakers: dict = {}
+
+
+def get_limiter(host: str, rate: Optional[float] = None) -> TokenBucket:
+    """the token bucket shared by every client talking to `host`"""
+    if host not in _limiters:
+        _limiters[host] = TokenBucket(rate)
+    return _limiters[host]
+
+
+def get_breaker(host: str) -> CircuitBreaker:
+    """the circuit breaker shared by every client talking to `host`"""
+    if host not in _breakers:
+        _breakers[host] = CircuitBreaker()
+    return _breakers[host]
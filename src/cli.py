@@ -0,0 +1,195 @@
+import argparse
+import asyncio
+import sys
+from typing import List, Optional
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="kori", description="Kori non-interactive commands")
+    parser.add_argument("--trace", action="store_true", help="time the pipeline and print a span / counter summary to stderr")
+    parser.add_argument("--trace-out", default=None, help="also write the trace as otlp-style json to this file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build-index", help="compile the dataset csv into the binary tf-idf index")
+    build.add_argument("--csv", help="dataset csv (default: src/constants/dataset.csv)")
+    build.add_argument("--limit", type=int, default=None, help="only index the first N synopses")
+    build.add_argument("--out", help="index root directory (default: src/constants/index)")
+    build.add_argument("--force", action="store_true", help="rebuild even if an index with the same key exists")
+    build.add_argument("--workers", type=int, default=None, help="tokenizer processes (default: one per cpu)")
+    build.add_argument("--hash-bits", type=int, default=None,
+                       help="use feature hashing into 2^N columns instead of a vocabulary (bounded memory)")
+    build.set_defaults(handler=cmd_build_index)
+
+    neighbors = commands.add_parser("build-neighbors", help="precompute the top-k similar animes of every dataset entry")
+    neighbors.add_argument("--csv", help="dataset csv (default: src/constants/dataset.csv)")
+    neighbors.add_argument("--limit", type=int, default=None, help="only index the first N synopses")
+    neighbors.add_argument("--k", type=int, default=20, help="neighbours kept per anime")
+    neighbors.add_argument("--block-rows", type=int, default=256, help="rows multiplied at once (memory ~ rows x dataset size x 8 bytes)")
+    neighbors.set_defaults(handler=cmd_build_neighbors)
+
+    recommend = commands.add_parser("recommend", help="similar animes of every id / title in a file, as json lines")
+    recommend.add_argument("queries", help="file with one anilist id or title per line ('-' for stdin)")
+    recommend.add_argument("--csv", help="dataset csv (default: src/constants/dataset.csv)")
+    recommend.add_argument("--limit", type=int, default=None, help="only index the first N synopses")
+    recommend.add_argument("--k", type=int, default=10, help="recommendations per query")
+    recommend.add_argument("--id-type", choices=("anilist", "mal"), default="anilist",
+                           help="what numeric queries are: anilist ids (default) or dataset / MAL anime_ids")
+    recommend.add_argument("--no-episodes", action="store_true",
+                           help="animes outside the dataset use only their synopsis, not the episode summaries")
+    recommend.add_argument("--block-rows", type=int, default=256, help="queries scored at once (memory ~ rows x dataset size x 8 bytes)")
+    recommend.add_argument("--out", help="write the json lines here instead of stdout")
+    recommend.set_defaults(handler=cmd_recommend)
+
+    serve = commands.add_parser("serve", help="http service answering search / similar / episodes from a warm index")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8000)
+    serve.add_argument("--csv", help="dataset csv (default: src/constants/dataset.csv)")
+    serve.add_argument("--limit", type=int, default=None, help="only index the first N synopses")
+    serve.add_argument("--max-connections", type=int, default=None, help="upstream api connections kept in the shared pool")
+    serve.add_argument("--http2", action="store_true", help="talk http/2 to the apis (needs the 'h2' package)")
+    serve.add_argument("--cache-size", type=int, default=10_000, help="animes / episode lists kept in memory")
+    serve.set_defaults(handler=cmd_serve)
+
+    ann = commands.add_parser("ann-report", help="recall@k and latency of the approximate (svd + lsh) engine vs exact search")
+    ann.add_argument("--csv", help="dataset csv (default: src/constants/dataset.csv)")
+    ann.add_argument("--limit", type=int, default=None, help="only index the first N synopses")
+    ann.add_argument("--k", type=int, default=10)
+    ann.add_argument("--queries", type=int, default=200, help="dataset rows used as queries")
+    ann.add_argument("--rank", type=int, default=128)
+    ann.add_argument("--tables", type=int, default=8)
+    ann.add_argument("--bits", type=int, default=12)
+    ann.add_argument("--probes", type=int, default=2)
+    ann.set_defaults(handler=cmd_ann_report)
+    return parser
+
+
+def cmd_build_index(args) -> int:
+    import time
+    from src.transformer.index import build_index, load_index
+    from src.utils.path import get_dataset_csv_path
+
+    csv_path = args.csv or get_dataset_csv_path()
+    start = time.perf_counter()
+    path = asyncio.run(build_index(csv_path, limit=args.limit, root=args.out, force=args.force,
+                                   workers=args.workers, hash_bits=args.hash_bits))
+    index = load_index(path)
+    elapsed = time.perf_counter() - start
+    matrix = index.transformer.matrix
+    print(f"✅ Index ready at {path}")
+    print(f"   {len(index)} documents, {index.transformer.n_features} features, "
+          f"{matrix.nnz} non-zeros ({matrix.nbytes / 1e6:.1f} MB) in {elapsed:.2f}s")
+    return 0
+
+
+def cmd_build_neighbors(args) -> int:
+    import time
+    from src.transformer.index import build_index, build_neighbors
+    from src.utils.path import get_dataset_csv_path
+
+    start = time.perf_counter()
+    path = asyncio.run(build_index(args.csv or get_dataset_csv_path(), limit=args.limit))
+    table = build_neighbors(path, k=args.k, block_rows=args.block_rows)
+    elapsed = time.perf_counter() - start
+    size = table.neighbors.nbytes + table.scores.nbytes
+    print(f"✅ Neighbour table for {len(table.anime_ids)} animes (k={table.k}, {size / 1e6:.1f} MB) in {elapsed:.2f}s")
+    return 0
+
+
+def cmd_recommend(args) -> int:
+    import contextlib
+    import json
+    import time
+
+    start = time.perf_counter()
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    found = total = 0
+    # o stdout e so do jsonl, qualquer outro print (stopwords, avisos da api) vai pro stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        from src.api.pool import close_pool
+        from src.transformer.index import get_or_build_index
+        from src.transformer.recommend import read_queries, recommend, resolve_queries
+        from src.utils.path import get_dataset_csv_path
+
+        if args.queries == "-":
+            queries = read_queries(sys.stdin)
+        else:
+            with open(args.queries, "r", encoding="utf-8") as f:
+                queries = read_queries(f)
+
+        async def prepare():
+            index = await get_or_build_index(args.csv or get_dataset_csv_path(), limit=args.limit)
+            try:
+                return index, await resolve_queries(index, queries, id_type=args.id_type,
+                                                    handle_episodes=not args.no_episodes)
+            finally:
+                await index.close()
+                await close_pool()
+
+        index, resolved = asyncio.run(prepare())
+        try:
+            for record in recommend(index, resolved, k=args.k, block_rows=args.block_rows):
+                found += "error" not in record
+                total += 1
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+        finally:
+            if out is not sys.stdout:
+                out.close()
+    elapsed = time.perf_counter() - start
+    print(f"✅ {found}/{total} queries answered in {elapsed:.2f}s", file=sys.stderr)
+    return 0
+
+
+def cmd_serve(args) -> int:
+    from src.api.pool import configure_pool
+    from src.server import serve
+
+    configure_pool(http2=args.http2)
+    if args.max_connections:
+        configure_pool(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+
+    try:
+        asyncio.run(serve(args.host, args.port, csv_path=args.csv, limit=args.limit, cache_size=args.cache_size))
+    except KeyboardInterrupt:
+        print("👋 Server stopped")
+    return 0
+
+
+def cmd_ann_report(args) -> int:
+    import json
+    import time
+    import numpy as np
+    from src.transformer.ann import ANNIndex, recall_report
+    from src.transformer.index import get_or_build_index
+    from src.utils.path import get_dataset_csv_path
+
+    index = asyncio.run(get_or_build_index(args.csv or get_dataset_csv_path(), limit=args.limit))
+    transformer = index.transformer
+    start = time.perf_counter()
+    ann = ANNIndex(rank=args.rank, n_tables=args.tables, n_bits=args.bits, probes=args.probes).fit(transformer.matrix)
+    fit_seconds = time.perf_counter() - start
+    rows = np.random.default_rng(0).choice(len(index), size=min(args.queries, len(index)), replace=False).tolist()
+    report = recall_report(ann, transformer, [transformer.matrix[row] for row in rows], k=args.k, query_rows=rows)
+    report["fit_seconds"] = fit_seconds
+    print(json.dumps(report, indent=2))
+    asyncio.run(index.close())
+    return 0
+
+
+def run(argv: Optional[List[str]] = None) -> int:
+    from src.utils import tracing
+
+    args = build_parser().parse_args(argv)
+    if args.trace or args.trace_out:
+        tracing.enable()
+    try:
+        return args.handler(args)
+    finally:
+        if tracing.is_enabled():
+            print(tracing.summary(), file=sys.stderr)
+            if args.trace_out:
+                tracing.export_json(args.trace_out)
+
+
+if __name__ == "__main__":
+    sys.exit(run())
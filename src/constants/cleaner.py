@@ -1,50 +1,98 @@
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from src.utils.remove_html_tags import remove_html_tags
+from typing import Iterator, Optional
+
+from src.utils import tracing
+
+# so as colunas que o projeto usa, com dtype fixo (sem inferencia do pandas a cada chunk)
+DATASET_DTYPES = {'anime_id': 'int64', 'Name': 'object', 'sypnopsis': 'object'}
+HTML_TAG_PATTERN = r'<[^>]+>'
+
+
+def _dataset_path(csv_path: Optional[str]) -> Path:
+    return Path(csv_path) if csv_path is not None else Path(__file__).parent / "dataset.csv"
 
 
 def load_dataset(csv_path: str) -> pd.DataFrame:
-    if csv_path is None:
-        csv_path = Path(__file__).parent / "dataset.csv"
-    df = pd.read_csv(csv_path)
+    df = pd.read_csv(_dataset_path(csv_path))
     return df
 
 
+def iter_synopses(csv_path: Optional[str] = None, limit: Optional[int] = None,
+                  chunksize: int = 4096) -> Iterator[dict]:
+    """
+    stream the dataset in chunks of `chunksize` rows, reading only anime_id / Name / sypnopsis.
+    yields batches as column arrays: {'anime_id': int64 array, 'title': array, 'synopsis': array},
+    rows without synopsis skipped and html stripped with one vectorized str.replace per chunk.
+    only one chunk is in memory at a time; `limit` caps the total number of rows yielded.
+    """
+    remaining = limit or None
+    reader = pd.read_csv(_dataset_path(csv_path), usecols=list(DATASET_DTYPES), dtype=DATASET_DTYPES,
+                         chunksize=chunksize)
+    with reader:
+        for chunk in reader:
+            chunk = chunk.dropna(subset=['sypnopsis'])
+            if remaining is not None:
+                chunk = chunk.head(remaining)
+                remaining -= len(chunk)
+            tracing.count("cleaner.chunks")
+            if len(chunk):
+                tracing.count("cleaner.rows", len(chunk))
+                synopses = chunk['sypnopsis'].astype(str).str.replace(HTML_TAG_PATTERN, '', regex=True).str.strip()
+                yield {
+                    'anime_id': chunk['anime_id'].to_numpy(dtype=np.int64),
+                    'title': chunk['Name'].fillna('').to_numpy(),
+                    'synopsis': synopses.to_numpy(),
+                }
+            if remaining == 0:
+                break
+
+
+# titulos do csv ja indexados, por caminho, pra nao reler o arquivo a cada busca
+_title_indexes = {}
+
+
+def get_title_index(csv_path: Optional[str] = None):
+    """(TitleIndex, columns) of the dataset, loaded once per csv path"""
+    from src.transformer.titles import TitleIndex
+
+    path = str(_dataset_path(csv_path).resolve())
+    if path not in _title_indexes:
+        batches = list(iter_synopses(path))
+        columns = {
+            name: np.concatenate([batch[name] for batch in batches]) if batches else np.zeros(0)
+            for name in ('anime_id', 'title', 'synopsis')
+        }
+        _title_indexes[path] = (TitleIndex(list(columns['title']), columns['anime_id']), columns)
+    return _title_indexes[path]
+
+
 #if some day i need it
 def get_synopsis_by_title(anime_title: str, csv_path: str) -> dict | None:
-    df = load_dataset(csv_path)
-    mask = df['Name'].str.contains(anime_title, case=False, na=False)
-    
-    if mask.any():
-        anime = df[mask].iloc[0]
-        
-        synopsis = anime.get('sypnopsis', '')
-        synopsis = remove_html_tags(synopsis)
-        
+    title_index, columns = get_title_index(csv_path)
+    rows = title_index.search(anime_title, limit=1)
+
+    if rows:
+        row = rows[0]
         return {
-            'anime_id': anime['anime_id'],
-            'title': anime['Name'],
-            'synopsis': synopsis.strip()
+            'anime_id': int(columns['anime_id'][row]),
+            'title': columns['title'][row],
+            'synopsis': columns['synopsis'][row]
         }
-    
+
     return None
 
 
 def get_all_synopses(csv_path: str, limit: int) -> list[dict]:
-    df = load_dataset(csv_path)
-    df = df.dropna(subset=['sypnopsis'])
-    
-    if limit:
-        df = df.head(limit)
-    
     results = []
-    for _, anime in df.iterrows():
-        synopsis = remove_html_tags(str(anime['sypnopsis']))
-        
-        results.append({
-            'anime_id': anime['anime_id'],
-            'title': anime['Name'],
-            'synopsis': synopsis.strip()
-        })
-    
+    with tracing.span("cleaner.get_all_synopses", limit=limit if limit is not None else -1):
+        for batch in iter_synopses(csv_path, limit=limit):
+            for anime_id, title, synopsis in zip(batch['anime_id'].tolist(), batch['title'], batch['synopsis']):
+                results.append({
+                    'anime_id': anime_id,
+                    'title': title,
+                    'synopsis': synopsis
+                })
+
     return results
@@ -0,0 +1,229 @@
+import asyncio
+import json
+import re
+import time
+from typing import Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import httpx
+
+from src.api.pool import close_pool, pool_stats
+from src.api.ratelimit import CircuitOpenError
+from src.transformer.index import CorpusIndex
+from src.utils.lru import LRUCache
+from src.utils.remove_html_tags import remove_html_tags
+
+# tamanho maximo da linha de request + headers, o resto e rejeitado
+MAX_HEADER_BYTES = 16 * 1024
+# nenhuma rota le o body, ele so e descartado
+MAX_BODY_BYTES = 64 * 1024
+KEEP_ALIVE_TIMEOUT = 15.0
+# animes / respostas do ani.zip guardados em memoria, os mais antigos saem primeiro
+MAX_CACHED_ANIMES = 10_000
+
+_ANIME_ROUTE = re.compile(r'^/anime/(\d+)/(similar|episodes)$')
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error", 502: "Bad Gateway", 503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _int_param(params: dict, name: str, default: int, low: int = 1, high: int = 100) -> int:
+    values = params.get(name)
+    if not values:
+        return default
+    try:
+        value = int(values[0])
+    except ValueError:
+        raise HTTPError(400, f"'{name}' must be an integer")
+    if not low <= value <= high:
+        raise HTTPError(400, f"'{name}' must be between {low} and {high}")
+    return value
+
+
+class KoriService:
+    """
+    the recommendation endpoints over a corpus index loaded once and kept warm.
+    every request shares the index transformer's APIManager (one pooled anilist + ani.zip client)
+    and its anime / episode caches, so repeated clicks on the same anime never hit the apis again.
+    those caches are capped at `cache_size` entries each (least recently used go first).
+    """
+
+    def __init__(self, index: CorpusIndex, cache_size: int = MAX_CACHED_ANIMES):
+        self.index = index
+        self.transformer = index.transformer
+        self.api = index.transformer.api
+        self.transformer.anime_cache = LRUCache(cache_size, self.transformer.anime_cache)
+        self.transformer.episodes_cache = LRUCache(cache_size, self.transformer.episodes_cache)
+        self.started_at = time.time()
+        self.requests = 0
+
+    async def handle(self, path: str, params: dict) -> dict:
+        """route a GET request, returning the json body or raising HTTPError"""
+        if path == "/health":
+            return {"status": "ok", "documents": len(self.index), "uptime": time.time() - self.started_at,
+                    "requests": self.requests, "pool": pool_stats(),
+                    "cached": {"animes": len(self.transformer.anime_cache), "episodes": len(self.transformer.episodes_cache)}}
+        if path == "/search":
+            title = (params.get("q") or params.get("title") or [""])[0].strip()
+            if not title:
+                raise HTTPError(400, "missing 'q'")
+            return await self.search(title, _int_param(params, "limit", 10, high=50), _int_param(params, "page", 1, high=10000))
+        match = _ANIME_ROUTE.match(path)
+        if match is None:
+            raise HTTPError(404, f"no route for {path}")
+        anilist_id, action = int(match.group(1)), match.group(2)
+        if action == "similar":
+            return await self.similar(anilist_id, _int_param(params, "k", 10))
+        return await self.episodes(anilist_id)
+
+    async def search(self, title: str, limit: int = 10, page: int = 1) -> dict:
+        results, total_pages = await self.api.anilist.search(title, limit=limit, page=page)
+        for anime in results:
+            anime["description"] = remove_html_tags(anime["description"] or "")
+            # o proximo /similar desse anime ja acha ele no cache
+            self.transformer.anime_cache.setdefault(anime["id"], anime)
+        return {"query": title, "page": page, "total_pages": total_pages, "results": results}
+
+    async def similar(self, anilist_id: int, k: int = 10) -> dict:
+        """
+        same flow as the interactive "similar animes" screen: the precomputed neighbour list when the
+        anime is in the dataset and build-neighbors was run with at least k neighbours, else its synopsis + episodes scored
+        against the index, with its own dataset row left out.
+        404 only when anilist answered that the id does not exist; its failures propagate (502 / 503).
+        """
+        transformer = self.transformer
+        await transformer.prefetch_animes([anilist_id])
+        anime = transformer.anime_cache.get(anilist_id)
+        if anime is None:
+            raise HTTPError(404, f"anime {anilist_id} not found on anilist")
+        variants = [anime.get("title_romaji"), anime.get("title_english"), anime.get("title_native")]
+        title = next((variant for variant in variants if variant), None)
+        row = self.index.title_index.resolve(anilist_id, anime.get("id_mal"), variants)
+        neighbors = self.index.neighbors
+        # a tabela so guarda neighbors.k similares por anime, pedidos maiores sao calculados
+        if row is not None and neighbors is not None and k <= neighbors.k:
+            similarities = neighbors.lookup_row(row, k=k)
+            source = "neighbors"
+        else:
+            doc = await transformer.create_doc(anilist_id, title, handle_episodes=True)
+            similarities = transformer.top_k(transformer.transform_query(doc), k=k,
+                                             exclude=[row] if row is not None else [])
+            source = "query"
+        return {
+            "anilist_id": anilist_id,
+            "title": title,
+            "anime_id": int(self.index.anime_ids[row]) if row is not None else None,
+            "source": source,
+            "results": [
+                {"anime_id": int(self.index.anime_ids[idx]), "title": self.index.titles[idx], "score": float(score)}
+                for idx, score in similarities
+            ],
+        }
+
+    async def episodes(self, anilist_id: int) -> dict:
+        mappings = await self.transformer.get_mappings(anilist_id)
+        episodes = self.api.anizip.extract_all_episodes_info((mappings or {}).get("episodes") or {}, anilist_id)
+        if not episodes:
+            raise HTTPError(404, f"no regular episodes found for anime {anilist_id}")
+        return {"anilist_id": anilist_id, "episodes": episodes}
+
+    async def respond(self, method: str, target: str) -> Tuple[int, dict]:
+        self.requests += 1
+        if method not in ("GET", "HEAD"):
+            return 405, {"error": f"method {method} not allowed"}
+        url = urlsplit(target)
+        try:
+            return 200, await self.handle(unquote(url.path).rstrip("/") or "/", parse_qs(url.query))
+        except HTTPError as e:
+            return e.status, {"error": e.message}
+        except CircuitOpenError as e:
+            # o breaker volta a deixar passar depois do cooldown, o cliente pode tentar mais tarde
+            return 503, {"error": f"upstream api unavailable: {e}"}
+        except httpx.HTTPError as e:
+            return 502, {"error": f"upstream api error: {str(e) or type(e).__name__}"}
+        except Exception as e:
+            print(f"❌ Error handling {target}: {e}")
+            return 500, {"error": "internal error"}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """minimal http/1.1 with keep-alive: one request at a time per connection, bodies ignored"""
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self._write(writer, 413, {"error": "request headers too large"}, keep_alive=False)
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                parts = lines[0].split()
+                if len(parts) != 3:
+                    await self._write(writer, 400, {"error": "malformed request line"}, keep_alive=False)
+                    return
+                method, target, version = parts
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+                length = headers.get("content-length", "0").strip() or "0"
+                if not length.isdigit():
+                    await self._write(writer, 400, {"error": "invalid Content-Length"}, keep_alive=False)
+                    return
+                if int(length) > MAX_BODY_BYTES:
+                    await self._write(writer, 413, {"error": "request body too large"}, keep_alive=False)
+                    return
+                if int(length):
+                    try:
+                        await reader.readexactly(int(length))
+                    except (asyncio.IncompleteReadError, ConnectionError):
+                        return
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" and (version == "HTTP/1.1" or connection == "keep-alive")
+                status, body = await self.respond(method, target)
+                await self._write(writer, status, body, keep_alive, head_only=method == "HEAD")
+                if not keep_alive:
+                    return
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    @staticmethod
+    async def _write(writer: asyncio.StreamWriter, status: int, body: dict, keep_alive: bool, head_only: bool = False):
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {_REASONS.get(status, 'OK')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode("latin-1")
+        writer.write(head if head_only else head + payload)
+        await writer.drain()
+
+
+async def serve(host: str = "127.0.0.1", port: int = 8000, csv_path: Optional[str] = None,
+                limit: Optional[int] = None, cache_size: int = MAX_CACHED_ANIMES):
+    """load (or build) the index once, then serve the endpoints until cancelled"""
+    from src.transformer.index import get_or_build_index
+    from src.utils.path import get_dataset_csv_path
+
+    start = time.perf_counter()
+    index = await get_or_build_index(csv_path or get_dataset_csv_path(), limit=limit)
+    service = KoriService(index, cache_size=cache_size)
+    server = await asyncio.start_server(service.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+    address = server.sockets[0].getsockname()
+    print(f"✅ Serving {len(index)} animes on http://{address[0]}:{address[1]} (ready in {time.perf_counter() - start:.2f}s)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await index.close()
+        await close_pool()
@@ -0,0 +1,146 @@
+import time
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+
+from src.transformer.sparse import CSRMatrix, SparseVector, select_top_k
+
+
+def truncated_svd(matrix: CSRMatrix, rank: int, n_iter: int = 4, oversample: int = 10,
+                  seed: Optional[int] = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    randomized truncated svd (halko et al.) of a sparse matrix, pure numpy.
+    returns (singular values, components) with components of shape (rank, n_cols),
+    so a row x is projected with components @ x.
+    """
+    rng = np.random.default_rng(seed)
+    rank = max(1, min(rank, min(matrix.shape)))
+    width = min(rank + oversample, min(matrix.shape))
+    transposed = matrix.transpose()
+    sketch = matrix.matmul(rng.standard_normal((matrix.shape[1], width)))
+    q, _ = np.linalg.qr(sketch)
+    # power iterations pra separar melhor os valores singulares de uma matriz de texto (cauda longa)
+    for _ in range(n_iter):
+        q, _ = np.linalg.qr(transposed.matmul(q))
+        q, _ = np.linalg.qr(matrix.matmul(q))
+    small = transposed.matmul(q).T  # = q.T @ matrix, (width x n_cols)
+    _, singular_values, vt = np.linalg.svd(small, full_matrices=False)
+    return singular_values[:rank], vt[:rank]
+
+
+class ANNIndex:
+    """
+    approximate nearest neighbours over a fitted tf-idf matrix:
+      1. rows are projected into a dense rank-`rank` lsa space (truncated svd)
+      2. `n_tables` random-hyperplane lsh tables of `n_bits` bits bucket the projected rows
+      3. a query collects the docs of its bucket in every table, plus `probes` extra buckets
+         per table obtained by flipping its least confident bits, and reranks them exactly
+    knobs: more tables / probes = better recall and slower queries, more bits = smaller
+    buckets = faster queries and lower recall, rank trades projection quality for memory.
+    """
+
+    def __init__(self, rank: int = 128, n_tables: int = 8, n_bits: int = 12, probes: int = 2,
+                 n_iter: int = 4, seed: Optional[int] = 0):
+        self.rank = rank
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.probes = probes
+        self.n_iter = n_iter
+        self.seed = seed
+        self.matrix: Optional[CSRMatrix] = None
+        self.components = None
+        self.embeddings = None
+        self.hyperplanes = None
+        self.tables = []
+
+    def fit(self, matrix: CSRMatrix) -> "ANNIndex":
+        self.matrix = matrix
+        _, self.components = truncated_svd(matrix, self.rank, n_iter=self.n_iter, seed=self.seed)
+        self.embeddings = self._normalize(matrix.matmul(self.components.T))
+        rng = np.random.default_rng(None if self.seed is None else self.seed + 1)
+        self.hyperplanes = rng.standard_normal((self.n_tables, self.n_bits, self.components.shape[0]))
+        weights = 1 << np.arange(self.n_bits, dtype=np.int64)
+        self.tables = []
+        for planes in self.hyperplanes:
+            keys = ((self.embeddings @ planes.T) > 0).astype(np.int64) @ weights
+            order = np.argsort(keys, kind="stable")
+            # cada tabela: chaves ordenadas + docs na mesma ordem, bucket = fatia via searchsorted
+            self.tables.append((keys[order], order))
+        return self
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def embed(self, query_vec: SparseVector) -> np.ndarray:
+        """project a sparse query into the lsa space (only touches its non-zero columns)"""
+        return self._normalize(self.components[:, query_vec.indices] @ query_vec.data)
+
+    def candidates(self, query_vec: SparseVector) -> np.ndarray:
+        """doc ids sharing a (probed) bucket with the query in at least one table"""
+        if self.matrix is None:
+            raise RuntimeError("ANNIndex is not fitted, call fit() first")
+        embedding = self.embed(query_vec)
+        weights = 1 << np.arange(self.n_bits, dtype=np.int64)
+        found = []
+        for planes, (keys, docs) in zip(self.hyperplanes, self.tables):
+            projection = planes @ embedding
+            key = int(((projection > 0).astype(np.int64)) @ weights)
+            probe_keys = [key]
+            # multi-probe: vira primeiro os bits com projecao mais perto de zero (menos confiaveis)
+            for bit in np.argsort(np.abs(projection))[:self.probes]:
+                probe_keys.append(key ^ (1 << int(bit)))
+            for probe in probe_keys:
+                lo, hi = np.searchsorted(keys, probe, side="left"), np.searchsorted(keys, probe, side="right")
+                found.append(docs[lo:hi])
+        return np.unique(np.concatenate(found)) if found else np.zeros(0, dtype=np.int64)
+
+    def top_k(self, query_vec: SparseVector, k: int = 10, exclude: Optional[Iterable[int]] = None,
+              skip: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        approximate top-k as (row index, exact cosine score), best first.
+        rows where the boolean mask `skip` is True (transformer.deleted) are left out, like the exact path.
+        """
+        docs = self.candidates(query_vec)
+        if skip is not None and skip.any():
+            docs = docs[~skip[docs]]
+        if exclude is not None:
+            docs = docs[~np.isin(docs, np.fromiter(exclude, dtype=np.int64))]
+        scores = self.matrix.dot_rows(docs, query_vec)
+        return [(int(docs[idx]), float(scores[idx])) for idx in select_top_k(scores, k)]
+
+
+def recall_report(ann: ANNIndex, transformer, queries: List[SparseVector], k: int = 10,
+                  query_rows: Optional[List[int]] = None) -> dict:
+    """
+    recall@k of the ann index against the exact Transformer.top_k for the same queries,
+    with mean latencies of both paths and the mean number of candidates reranked.
+    when the queries are corpus rows, pass their row ids in query_rows so each one is
+    excluded from its own results. docs with score 0 are not counted as neighbours.
+    """
+    hits = relevant = 0
+    ann_time = exact_time = 0.0
+    candidates = 0
+    for i, query in enumerate(queries):
+        exclude = [query_rows[i]] if query_rows is not None else None
+        start = time.perf_counter()
+        exact = [doc for doc, score in transformer.top_k(query, k, exclude=exclude) if score > 0]
+        exact_time += time.perf_counter() - start
+        start = time.perf_counter()
+        approx = {doc for doc, _ in ann.top_k(query, k, exclude=exclude, skip=transformer.deleted)}
+        ann_time += time.perf_counter() - start
+        candidates += len(ann.candidates(query))
+        hits += len(approx.intersection(exact))
+        relevant += len(exact)
+    n = max(len(queries), 1)
+    return {
+        "k": k,
+        "queries": len(queries),
+        "recall": hits / relevant if relevant else 1.0,
+        "ann_ms": 1000 * ann_time / n,
+        "exact_ms": 1000 * exact_time / n,
+        "mean_candidates": candidates / n,
+        "documents": ann.matrix.shape[0],
+        "settings": {"rank": ann.rank, "n_tables": ann.n_tables, "n_bits": ann.n_bits, "probes": ann.probes},
+    }
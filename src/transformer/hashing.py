@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+
+from src.transformer.sparse import CSRMatrix, SparseVector
+from src.transformer.transformer import Transformer, get_stopwords, tokenize
+
+
+@lru_cache(maxsize=1 << 16)
+def _token_hash(token: str) -> int:
+    # blake2b em vez de hash(): o hash do python muda a cada processo (PYTHONHASHSEED)
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def hash_tokens(tokens: List[str], n_features_log2: int, alternate_sign: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (sorted column ids, signed counts) of a document in a 2^n_features_log2 feature space.
+    with alternate_sign half of the tokens count as -1, so collisions cancel out on average
+    instead of always inflating a column. columns whose counts cancel to 0 are dropped.
+    """
+    if not tokens:
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float64)
+    hashes = np.fromiter((_token_hash(token) for token in tokens), dtype=np.uint64, count=len(tokens))
+    columns = (hashes & np.uint64((1 << n_features_log2) - 1)).astype(np.int64)
+    signs = np.where(hashes >> np.uint64(63), -1.0, 1.0) if alternate_sign else np.ones(len(tokens))
+    cols, inverse = np.unique(columns, return_inverse=True)
+    counts = np.bincount(inverse, weights=signs, minlength=len(cols))
+    nonzero = counts != 0
+    return cols[nonzero].astype(np.int32), counts[nonzero]
+
+
+def _hash_chunk(args) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # top level pra poder ser enviado aos processos do pool; devolve so arrays, nada de vocabulario
+    texts, n_features_log2, alternate_sign = args
+    rows = [hash_tokens(tokenize(text), n_features_log2, alternate_sign) for text in texts]
+    counts = CSRMatrix.from_rows(rows, 1 << n_features_log2)
+    return counts.indptr, counts.indices, counts.data
+
+
+class HashingTransformer(Transformer):
+    """
+    tf-idf over a fixed 2^n_features_log2 hashed feature space instead of a vocabulary.
+    memory for idf / document frequencies stays the same whatever the corpus size, and
+    counts built by different workers line up column by column, so they are just summed.
+    documents are streamed in with partial_fit(); idf and row norms are recomputed lazily.
+    with alternate_sign weights can be negative, so there is no inverted index (top_k is brute force).
+    """
+
+    def __init__(self, n_features_log2: int = 18, alternate_sign: bool = True, min_df: int = 1,
+                 max_df: float = 0.95, max_concurrency: int = 8):
+        super().__init__(min_df=min_df, max_df=max_df, max_concurrency=max_concurrency)
+        self.n_features_log2 = n_features_log2
+        self.alternate_sign = alternate_sign
+
+    @property
+    def n_features(self) -> int:
+        return 1 << self.n_features_log2
+
+    def _count(self, tokens: List[str]):
+        return hash_tokens(tokens, self.n_features_log2, self.alternate_sign)
+
+    def _add_terms(self, tokens: List[str]):
+        # sem vocabulario, toda coluna ja existe
+        pass
+
+    def _drop_unused_terms(self, counts: CSRMatrix) -> CSRMatrix:
+        return counts
+
+    def _reset(self):
+        self._fit_counts(CSRMatrix.from_rows([], self.n_features))
+
+    def fit(self, documents: List[List[str]]) -> "HashingTransformer":
+        """fit idf_values and the corpus matrix on a list of token lists, no vocabulary involved"""
+        return self._fit_counts(CSRMatrix.from_rows([self._count(tokens) for tokens in documents], self.n_features))
+
+    def partial_fit(self, documents: List[List[str]]) -> List[int]:
+        """
+        stream a batch of documents into the corpus (document frequencies are updated,
+        idf and the matrix are only recomputed on the next query). returns their row ids.
+        """
+        if not self.is_fitted:
+            self._reset()
+        return self.add_documents(documents)
+
+    def merge(self, other: "HashingTransformer") -> "HashingTransformer":
+        """
+        append the corpus of another HashingTransformer with the same feature space (e.g. fitted
+        by another worker): rows are stacked and document frequencies summed, nothing to reconcile.
+        """
+        if (other.n_features_log2, other.alternate_sign) != (self.n_features_log2, self.alternate_sign):
+            raise ValueError("can only merge HashingTransformers with the same n_features_log2 / alternate_sign")
+        if not self.is_fitted:
+            self._reset()
+        if not other.is_fitted:
+            return self
+        self._check_updatable()
+        self._merge_pending()
+        other._merge_pending()
+        self.counts = CSRMatrix.vstack([self.counts, other.counts], self.n_features)
+        self.document_frequencies = self.document_frequencies + other.document_frequencies
+        self.deleted = np.concatenate([self.deleted, other.deleted])
+        self.document_count += other.document_count
+        self._stale = True
+        return self
+
+    def fit_texts(self, texts: Iterable[str], workers: Optional[int] = None, chunksize: int = 256) -> "HashingTransformer":
+        """
+        tokenize, hash and fit raw texts. chunks of `chunksize` texts are hashed in `workers`
+        processes (default: one per cpu), each one sending back only its count arrays.
+        """
+        texts = list(texts)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        chunks = [(texts[i:i + chunksize], self.n_features_log2, self.alternate_sign)
+                  for i in range(0, len(texts), chunksize)]
+        if workers <= 1 or len(chunks) <= 1:
+            parts = [_hash_chunk(chunk) for chunk in chunks]
+        else:
+            get_stopwords()  # carrega antes do pool, os processos herdam em vez de ler de novo
+            with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+                parts = list(pool.map(_hash_chunk, chunks))
+        matrices = [CSRMatrix(indptr, indices, data, (len(indptr) - 1, self.n_features))
+                    for indptr, indices, data in parts]
+        return self._fit_counts(CSRMatrix.vstack(matrices, self.n_features))
+
+    def transform_query(self, tokens: List[str]) -> SparseVector:
+        """project a new document into the hashed space, every token has a column"""
+        if not self.is_fitted:
+            raise RuntimeError("Transformer is not fitted, call fit() first")
+        self._sync()
+        return self._weigh(CSRMatrix.from_rows([self._count(tokens)], self.n_features)).getrow(0)
+
+    @property
+    def supports_inverted_index(self) -> bool:
+        return not self.alternate_sign
+
+    def build_inverted_index(self):
+        if not self.supports_inverted_index:
+            raise ValueError("signed feature hashing gives negative weights, the inverted index can not be used")
+        return super().build_inverted_index()
+
+    def save(self, path, metadata: Optional[dict] = None):
+        super().save(path, metadata)
+        with open(Path(path) / "hashing.json", "w", encoding="utf-8") as f:
+            json.dump({"n_features_log2": self.n_features_log2, "alternate_sign": self.alternate_sign}, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode: Optional[str] = None) -> "HashingTransformer":
+        transformer = super().load(path, mmap_mode=mmap_mode)
+        with open(Path(path) / "hashing.json", "r", encoding="utf-8") as f:
+            settings = json.load(f)
+        transformer.n_features_log2 = settings["n_features_log2"]
+        transformer.alternate_sign = settings["alternate_sign"]
+        return transformer
@@ -0,0 +1,322 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+
+from src.transformer.hashing import HashingTransformer
+from src.transformer.inverted import InvertedIndex
+from src.transformer.neighbors import NeighborTable, compute_neighbors
+from src.transformer.titles import TitleIndex
+from src.transformer.transformer import TOKENIZER_VERSION, Transformer, get_stopwords, tokenize
+from src.utils import tracing
+
+# bump when the on-disk layout changes
+INDEX_VERSION = 3
+
+
+def preprocessing_settings(min_df: int, max_df: float, limit: Optional[int] = None,
+                           hash_bits: Optional[int] = None) -> dict:
+    """everything that changes the content of a built index besides the csv itself"""
+    stopwords = "\n".join(sorted(get_stopwords())).encode("utf-8")
+    return {
+        "index_version": INDEX_VERSION,
+        "tokenizer_version": TOKENIZER_VERSION,
+        "stopwords_sha256": hashlib.sha256(stopwords).hexdigest(),
+        "min_df": min_df,
+        "max_df": max_df,
+        "limit": limit,
+        "hash_bits": hash_bits,
+    }
+
+
+def _csv_digest(csv_path):
+    digest = hashlib.sha256()
+    with open(csv_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest
+
+
+def _settings_key(csv_digest, settings: dict) -> str:
+    digest = csv_digest.copy()
+    digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def index_key(csv_path, settings: dict) -> str:
+    """sha256 of the csv bytes plus the preprocessing settings"""
+    return _settings_key(_csv_digest(csv_path), settings)
+
+
+def _dataset_rows(directory: Path) -> Optional[int]:
+    """how many dataset entries a built index was made from (None if it was never built)"""
+    try:
+        with open(directory / "index.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta.get("dataset_rows", meta.get("documents"))
+
+
+class CorpusIndex:
+    """
+    a built corpus index: the fitted transformer (with its inverted index) plus the id/title table of its rows.
+    arrays are memory-mapped when loaded with mmap=True; synopses are only read when asked for.
+    """
+
+    def __init__(self, path: Path, transformer: Transformer, anime_ids: np.ndarray, titles: List[str], meta: dict,
+                 neighbors: Optional[NeighborTable] = None):
+        self.path = Path(path)
+        self.transformer = transformer
+        self.anime_ids = anime_ids
+        self.titles = titles
+        self.meta = meta
+        self.neighbors = neighbors  # tabela pre-computada de similares, ver build_neighbors()
+        self._synopses = None
+        self._rows = None  # anime_id -> linha viva, montado no primeiro upsert/delete
+        self._title_index = None
+
+    @property
+    def key(self) -> str:
+        return self.meta["key"]
+
+    @property
+    def synopses(self) -> List[str]:
+        if self._synopses is None:
+            with open(self.path / "synopses.json", "r", encoding="utf-8") as f:
+                self._synopses = json.load(f)
+        return self._synopses
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    @property
+    def title_index(self) -> TitleIndex:
+        """exact / prefix / fuzzy title and id lookups over the live rows, built on first use"""
+        if self._title_index is None:
+            self._title_index = TitleIndex(self.titles, self.anime_ids, skip=self.transformer.deleted)
+        return self._title_index
+
+    def row_of(self, anime_id) -> Optional[int]:
+        """the live row of a dataset anime_id, or None"""
+        if self._rows is None:
+            deleted = self.transformer.deleted
+            self._rows = {int(anime_id): row for row, anime_id in enumerate(self.anime_ids)
+                          if row >= len(deleted) or not deleted[row]}
+        return self._rows.get(int(anime_id))
+
+    def upsert(self, anime_id: int, title: str, synopsis: str, tokens: Optional[List[str]] = None) -> int:
+        """
+        add an anime to the index, or replace its document if it is already there, without a rebuild.
+        tokens default to tokenize(synopsis). returns the row of the new document.
+        the neighbour table is dropped since it no longer matches the corpus.
+        """
+        tokens = tokenize(synopsis) if tokens is None else tokens
+        synopses = self.synopses
+        old = self.row_of(anime_id)
+        if old is None:
+            row = self.transformer.add_documents([tokens])[0]
+        else:
+            row = self.transformer.update_document(old, tokens)
+        self.anime_ids = np.append(self.anime_ids, np.int64(anime_id))
+        self.titles.append(str(title))
+        synopses.append(synopsis)
+        self._rows[int(anime_id)] = row
+        self.neighbors = None
+        self._title_index = None
+        return row
+
+    def delete(self, anime_id: int) -> bool:
+        """remove an anime from the index, False if it was not in it"""
+        row = self.row_of(anime_id)
+        if row is None:
+            return False
+        self.transformer.delete_documents([row])
+        del self._rows[int(anime_id)]
+        self.neighbors = None
+        self._title_index = None
+        return True
+
+    def compact(self):
+        """reclaim deleted rows, keeping anime_ids / titles / synopses aligned with the matrix"""
+        synopses = self.synopses
+        keep = self.transformer.compact() >= 0
+        self.anime_ids = np.asarray(self.anime_ids)[keep]
+        self.titles = [title for title, kept in zip(self.titles, keep) if kept]
+        self._synopses = [synopsis for synopsis, kept in zip(synopses, keep) if kept]
+        self._rows = None
+        self._title_index = None
+
+    def save(self):
+        """write the (updated) index back to self.path, swapping the whole directory at once"""
+        tmp_dir = self.path.parent / f".{self.path.name}.{os.getpid()}.tmp"
+        old_dir = self.path.parent / f".{self.path.name}.{os.getpid()}.old"
+        meta = dict(self.meta, documents=self.transformer.document_count, updated_at=time.time())
+        _write_index(tmp_dir, self.transformer, self.anime_ids, self.titles, self.synopses, meta)
+        if self.neighbors is not None:
+            self.neighbors.save(tmp_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        os.replace(self.path, old_dir)
+        os.replace(tmp_dir, self.path)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        self.meta = meta
+
+    async def close(self):
+        await self.transformer.close_client()
+
+
+def _write_index(directory: Path, transformer: Transformer, anime_ids, titles: List[str], synopses: List[str], meta: dict):
+    shutil.rmtree(directory, ignore_errors=True)
+    transformer.save(directory)
+    if transformer.supports_inverted_index:
+        (transformer.inverted_index or transformer.build_inverted_index()).save(directory)
+    np.save(directory / "anime_ids.npy", np.asarray(anime_ids, dtype=np.int64))
+    TitleIndex(titles, anime_ids, skip=transformer.deleted).save(directory)
+    with open(directory / "titles.json", "w", encoding="utf-8") as f:
+        json.dump(titles, f, ensure_ascii=False)
+    with open(directory / "synopses.json", "w", encoding="utf-8") as f:
+        json.dump(synopses, f, ensure_ascii=False)
+    with open(directory / "index.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+@tracing.traced("index.build")
+async def build_index(csv_path, limit: Optional[int] = None, root: Optional[Path] = None,
+                      min_df: int = 1, max_df: float = 0.95, force: bool = False,
+                      workers: Optional[int] = None, hash_bits: Optional[int] = None) -> Path:
+    """
+    compile the dataset into a binary index directory under `root`, named after its key.
+    returns the directory; if an index with the same key already exists it is reused unless force=True.
+    tokenization is spread over `workers` processes (see Transformer.preprocess_many).
+    with hash_bits the index uses a HashingTransformer over 2^hash_bits features instead of a vocabulary.
+    """
+    from src.constants.cleaner import iter_synopses
+    from src.utils.path import get_index_dir
+
+    root = Path(root) if root is not None else get_index_dir()
+    csv_digest = _csv_digest(csv_path)
+    full_settings = preprocessing_settings(min_df, max_df, None, hash_bits)
+    full_dir = root / _settings_key(csv_digest, full_settings)[:16]
+    settings = preprocessing_settings(min_df, max_df, limit, hash_bits) if limit is not None else full_settings
+    key = _settings_key(csv_digest, settings)
+    out_dir = root / key[:16]
+    if not force:
+        if (out_dir / "index.json").exists():
+            return out_dir
+        # um limite maior que o dataset da o mesmo indice que sem limite, reaproveita o build completo
+        full_rows = _dataset_rows(full_dir)
+        if limit is not None and full_rows is not None and full_rows <= limit:
+            return full_dir
+
+    anime_ids, titles, texts = [], [], []
+    for batch in iter_synopses(csv_path, limit=limit):
+        anime_ids.extend(batch['anime_id'].tolist())
+        titles.extend(str(title) for title in batch['title'])
+        texts.extend(batch['synopsis'].tolist())
+    if limit is not None and len(texts) < limit:
+        # o dataset acabou antes do limite: grava como o indice completo (limit None)
+        settings, key, out_dir = full_settings, _settings_key(csv_digest, full_settings), full_dir
+    if hash_bits is not None:
+        transformer = HashingTransformer(n_features_log2=hash_bits, min_df=min_df, max_df=max_df)
+    else:
+        transformer = Transformer(min_df=min_df, max_df=max_df)
+    try:
+        if hash_bits is not None:
+            transformer.fit_texts(texts, workers=workers)
+        else:
+            transformer.fit(transformer.preprocess_many(texts, workers=workers))
+    finally:
+        await transformer.close_client()
+
+    # escreve num diretorio temporario e renomeia no final, assim ninguem le um indice pela metade
+    tmp_dir = root / f".{key[:16]}.{os.getpid()}.tmp"
+    _write_index(
+        tmp_dir, transformer, anime_ids, titles, texts,
+        {
+            "key": key,
+            "settings": settings,
+            "csv_path": str(Path(csv_path).resolve()),
+            "documents": len(texts),
+            "dataset_rows": len(texts),
+            "built_at": time.time(),
+        },
+    )
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    _prune_stale(root, out_dir)
+    return out_dir
+
+
+def _prune_stale(root: Path, current: Path):
+    """
+    remove older builds of the same csv + limit, they can never be hit again. after a full build
+    (limit None) builds whose limit covers the whole dataset go too, build_index reuses the full one for them.
+    """
+    with open(current / "index.json", "r", encoding="utf-8") as f:
+        info = json.load(f)
+    limit = info["settings"]["limit"]
+    rows = info.get("dataset_rows", info.get("documents"))
+    for other in root.iterdir():
+        if other == current or not (other / "index.json").exists():
+            continue
+        try:
+            with open(other / "index.json", "r", encoding="utf-8") as f:
+                other_info = json.load(f)
+        except Exception:
+            continue
+        if other_info.get("csv_path") != info["csv_path"]:
+            continue
+        other_limit = other_info.get("settings", {}).get("limit")
+        if other_limit == limit or (limit is None and other_limit is not None and other_limit >= rows):
+            shutil.rmtree(other, ignore_errors=True)
+
+
+@tracing.traced("index.load")
+def load_index(path, mmap: bool = True) -> CorpusIndex:
+    """open a built index; with mmap=True the numeric arrays are memory-mapped read only"""
+    path = Path(path)
+    mmap_mode = "r" if mmap else None
+    with open(path / "index.json", "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("settings", {}).get("index_version") != INDEX_VERSION:
+        raise ValueError(f"index at {path} has version {meta.get('settings', {}).get('index_version')}, expected {INDEX_VERSION}")
+    transformer_cls = HashingTransformer if (path / "hashing.json").exists() else Transformer
+    transformer = transformer_cls.load(path, mmap_mode=mmap_mode)
+    if (path / "postings_indptr.npy").exists():
+        transformer.inverted_index = InvertedIndex.load(path, transformer.matrix, mmap_mode=mmap_mode)
+    anime_ids = np.load(path / "anime_ids.npy", mmap_mode=mmap_mode)
+    with open(path / "titles.json", "r", encoding="utf-8") as f:
+        titles = json.load(f)
+    neighbors = NeighborTable.load(path, anime_ids, mmap_mode=mmap_mode)
+    index = CorpusIndex(path, transformer, anime_ids, titles, meta, neighbors)
+    index._title_index = TitleIndex.load(path, titles, anime_ids, skip=transformer.deleted)
+    return index
+
+
+def build_neighbors(path, k: int = 20, block_rows: int = 256) -> NeighborTable:
+    """
+    precompute the top-k neighbours of every row of the index at `path` and store them
+    next to it (neighbors.npy int32 / neighbor_scores.npy float32).
+    """
+    path = Path(path)
+    index = load_index(path, mmap=True)
+    transformer = index.transformer
+    neighbors, scores = compute_neighbors(transformer.matrix, k=k, block_rows=block_rows,
+                                          postings=transformer.inverted_index.postings if transformer.inverted_index else None)
+    # grava com outro nome e renomeia, quem estiver lendo o indice nunca ve um arquivo pela metade
+    for name, array in (("neighbors", neighbors), ("neighbor_scores", scores)):
+        np.save(path / f".{name}.tmp.npy", array)
+        os.replace(path / f".{name}.tmp.npy", path / f"{name}.npy")
+    return NeighborTable(np.asarray(index.anime_ids), neighbors, scores)
+
+
+async def get_or_build_index(csv_path, limit: Optional[int] = None, root: Optional[Path] = None, mmap: bool = True,
+                             workers: Optional[int] = None) -> CorpusIndex:
+    """load the index for csv_path/limit, building it first if the csv or the settings changed"""
+    path = await build_index(csv_path, limit=limit, root=root, workers=workers)
+    return load_index(path, mmap=mmap)
@@ -0,0 +1,136 @@
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+
+from src.transformer.sparse import CSRMatrix, SparseVector, select_top_k
+
+# cada posting visitado custa umas 5x uma entrada do produto completo (loop por termo + np.unique),
+# entao so vale a pena quando a estimativa fica bem abaixo do nnz da matriz
+POSTINGS_COST_RATIO = 0.1
+# custo fixo de cada termo da query, em postings
+TERM_OVERHEAD = 1000
+
+
+class InvertedIndex:
+    """
+    term -> postings (doc id, weight) view of a fitted tf-idf matrix.
+    top_k() only walks the postings of the query terms and uses MaxScore pruning:
+    once the k-th best partial score beats what any unseen document could still reach,
+    no new candidates are admitted and hopeless ones are dropped. the surviving candidates
+    are rescored exactly like the brute force path, so results are identical to Transformer.similarities.
+    weights must be non-negative (true for tf-idf, not for signed feature hashing).
+    pruning only pays off for short queries over selective terms, see worth_it().
+    """
+
+    def __init__(self, matrix: CSRMatrix, postings: Optional[CSRMatrix] = None, max_weights: Optional[np.ndarray] = None):
+        if matrix.nnz and matrix.data.min() < 0:
+            raise ValueError("InvertedIndex needs non-negative weights")
+        self.matrix = matrix
+        self.postings = postings if postings is not None else matrix.transpose()
+        if max_weights is None:
+            max_weights = np.zeros(self.postings.shape[0], dtype=np.float64)
+            non_empty = np.flatnonzero(np.diff(self.postings.indptr))
+            if len(non_empty):
+                max_weights[non_empty] = np.maximum.reduceat(self.postings.data, self.postings.indptr[non_empty])
+        self.max_weights = max_weights
+
+    def save(self, path):
+        path = Path(path)
+        np.save(path / "postings_indptr.npy", self.postings.indptr)
+        np.save(path / "postings_docs.npy", self.postings.indices)
+        np.save(path / "postings_weights.npy", self.postings.data)
+        np.save(path / "max_weights.npy", self.max_weights)
+
+    @classmethod
+    def load(cls, path, matrix: CSRMatrix, mmap_mode: Optional[str] = None) -> "InvertedIndex":
+        path = Path(path)
+        postings = CSRMatrix(
+            np.load(path / "postings_indptr.npy", mmap_mode=mmap_mode),
+            np.load(path / "postings_docs.npy", mmap_mode=mmap_mode),
+            np.load(path / "postings_weights.npy", mmap_mode=mmap_mode),
+            (matrix.shape[1], matrix.shape[0]),
+        )
+        return cls(matrix, postings, np.load(path / "max_weights.npy", mmap_mode=mmap_mode))
+
+    def estimated_cost(self, query_vec: SparseVector) -> int:
+        """
+        postings entries top_k() would touch at most: the candidate set after each term is bounded by
+        the postings seen so far (capped at the corpus size), plus a fixed overhead per term.
+        """
+        terms = query_vec.indices[query_vec.data > 0]
+        if not len(terms):
+            return 0
+        lengths = np.diff(self.postings.indptr)[terms]
+        bounds = query_vec.data[query_vec.data > 0] * self.max_weights[terms]
+        seen = np.cumsum(lengths[np.argsort(-bounds, kind="stable")])
+        return int(np.minimum(seen, self.matrix.shape[0]).sum()) + TERM_OVERHEAD * len(terms)
+
+    def worth_it(self, query_vec: SparseVector) -> bool:
+        """true when walking the postings is expected to beat the full matrix product for this query"""
+        return self.estimated_cost(query_vec) < POSTINGS_COST_RATIO * self.matrix.nnz
+
+    def top_k(self, query_vec: SparseVector, k: int = 10, exclude: Optional[Iterable[int]] = None) -> List[Tuple[int, float]]:
+        """same result as brute-force Transformer.top_k over the whole matrix"""
+        n_docs = self.matrix.shape[0]
+        excluded = np.unique(np.fromiter(exclude, dtype=np.int64)) if exclude is not None else np.zeros(0, dtype=np.int64)
+        k = min(k, n_docs - len(excluded))
+        if k <= 0:
+            return []
+
+        terms = query_vec.indices[query_vec.data > 0]
+        weights = query_vec.data[query_vec.data > 0]
+        bounds = weights * self.max_weights[terms]
+        order = np.argsort(-bounds, kind="stable")
+        terms, weights, bounds = terms[order], weights[order], bounds[order]
+        # rest[i] = maior score que um doc ainda nao visto pode alcancar depois do termo i
+        rest = np.concatenate([np.cumsum(bounds[::-1])[::-1][1:], [0.0]]) if len(bounds) else bounds
+
+        cand_docs = np.zeros(0, dtype=np.int64)
+        cand_scores = np.zeros(0, dtype=np.float64)
+        admitting = True
+        for i, (term, weight) in enumerate(zip(terms, weights)):
+            start, end = self.postings.indptr[term], self.postings.indptr[term + 1]
+            docs = np.asarray(self.postings.indices[start:end], dtype=np.int64)
+            contrib = weight * self.postings.data[start:end]
+            if admitting:
+                merged, inverse = np.unique(np.concatenate([cand_docs, docs]), return_inverse=True)
+                cand_scores = np.bincount(inverse, weights=np.concatenate([cand_scores, contrib]), minlength=len(merged))
+                cand_docs = merged
+            elif len(cand_docs) and len(docs):
+                pos = np.minimum(np.searchsorted(docs, cand_docs), len(docs) - 1)
+                hit = docs[pos] == cand_docs
+                cand_scores[hit] += contrib[pos[hit]]
+
+            threshold = self._kth_score(cand_docs, cand_scores, excluded, k)
+            if threshold is None:
+                continue
+            if admitting and threshold > rest[i]:
+                admitting = False
+            if not admitting:
+                # candidatos que nem com todos os termos restantes chegam no k-esimo saem da disputa
+                keep = cand_scores + rest[i] >= threshold
+                cand_docs, cand_scores = cand_docs[keep], cand_scores[keep]
+
+        if len(excluded):
+            keep = ~np.isin(cand_docs, excluded)
+            cand_docs = cand_docs[keep]
+        # score exato, somado na mesma ordem que CSRMatrix.dot
+        scores = self.matrix.dot_rows(cand_docs, query_vec)
+        picked = select_top_k(scores, k)
+        results = [(int(cand_docs[idx]), float(scores[idx])) for idx in picked]
+        if len(results) < k:
+            # o brute force completa com docs de score 0, menor indice primeiro
+            taken = set(cand_docs.tolist()) | set(excluded.tolist())
+            for doc in range(n_docs):
+                if len(results) == k:
+                    break
+                if doc not in taken:
+                    results.append((doc, 0.0))
+        return results
+
+    @staticmethod
+    def _kth_score(cand_docs: np.ndarray, cand_scores: np.ndarray, excluded: np.ndarray, k: int) -> Optional[float]:
+        scores = cand_scores[~np.isin(cand_docs, excluded)] if len(excluded) else cand_scores
+        if len(scores) < k:
+            return None
+        return float(np.partition(scores, len(scores) - k)[len(scores) - k])
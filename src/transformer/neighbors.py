@@ -0,0 +1,114 @@
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+import numpy as np
+
+from src.transformer.sparse import CSRMatrix, blocked_product, select_top_k
+
+
+def compute_neighbors(matrix: CSRMatrix, k: int = 20, block_rows: int = 256,
+                      postings: Optional[CSRMatrix] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    top-k most similar rows of every row of a fitted tf-idf matrix (itself excluded).
+    computed block by block with blocked_product, so memory is block_rows x n_docs.
+    returns (neighbors int32, scores float32), both (n_docs x k), best first;
+    rows with fewer than k positive scores are padded with -1 / 0.
+    """
+    n_docs = matrix.shape[0]
+    k = max(0, min(k, n_docs - 1))
+    neighbors = np.full((n_docs, k), -1, dtype=np.int32)
+    scores = np.zeros((n_docs, k), dtype=np.float32)
+    if k == 0:
+        return neighbors, scores
+    postings = postings if postings is not None else matrix.transpose()
+    for start, top, top_scores in batch_top_k(matrix, postings, k, exclude_rows=np.arange(n_docs), block_rows=block_rows):
+        neighbors[start:start + len(top)] = top
+        scores[start:start + len(top)] = top_scores
+    return neighbors, scores
+
+
+def batch_top_k(queries: CSRMatrix, postings: CSRMatrix, k: int, exclude_rows: Optional[np.ndarray] = None,
+                skip: Optional[np.ndarray] = None, block_rows: int = 256) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+    """
+    top-k corpus rows of many L2-normalized queries at once: queries @ corpus.T, block by block.
+    postings is the corpus transposed (see InvertedIndex.postings). exclude_rows[i] is a corpus row
+    left out of query i's results (-1 for none, e.g. the query anime itself); corpus rows where
+    `skip` is True (deleted rows) are left out of every query.
+    yields (first query, neighbors int32, scores float32) per block, k columns each, best first,
+    padded with -1 / 0 when a query has fewer than k positive scores.
+    """
+    n_docs = postings.shape[1]
+    k = max(0, min(k, n_docs))
+    skipped = np.flatnonzero(skip[:n_docs]) if skip is not None else np.zeros(0, dtype=np.int64)
+    for start, block in blocked_product(queries, postings, block_rows=block_rows):
+        if len(skipped):
+            block[:, skipped] = -np.inf
+        if exclude_rows is not None:
+            rows = np.arange(block.shape[0])
+            own = np.asarray(exclude_rows[start:start + block.shape[0]])
+            block[rows[own >= 0], own[own >= 0]] = -np.inf  # o proprio anime nao conta
+        if k == 0:
+            yield start, np.zeros((block.shape[0], 0), dtype=np.int32), np.zeros((block.shape[0], 0), dtype=np.float32)
+            continue
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(block, top, axis=1)
+        # o argpartition pega qualquer subconjunto dos empatados no k-esimo score: nas linhas onde
+        # sobrou empatado de fora, refaz com select_top_k (mesma regra do Transformer.top_k)
+        kth = top_scores.min(axis=1)
+        tied = (kth > 0) & ((block == kth[:, None]).sum(axis=1) > (top_scores == kth[:, None]).sum(axis=1))
+        for row in np.flatnonzero(tied):
+            top[row] = select_top_k(block[row], k)
+            top_scores[row] = block[row, top[row]]
+        # ordena os k de cada linha por score desc, empate pelo menor indice
+        order = np.lexsort((top, -top_scores), axis=1)
+        top = np.take_along_axis(top, order, axis=1).astype(np.int32)
+        top_scores = np.take_along_axis(top_scores, order, axis=1).astype(np.float32)
+        empty = top_scores <= 0
+        top[empty] = -1
+        top_scores[empty] = 0
+        yield start, top, top_scores
+
+
+class NeighborTable:
+    """
+    precomputed similar-anime lists of a corpus index, looked up by dataset anime_id.
+    neighbors[i] / scores[i] are the rows most similar to row i of the index.
+    """
+
+    def __init__(self, anime_ids: np.ndarray, neighbors: np.ndarray, scores: np.ndarray):
+        self.anime_ids = anime_ids
+        self.neighbors = neighbors
+        self.scores = scores
+        self._rows = {int(anime_id): row for row, anime_id in enumerate(anime_ids)}
+
+    @property
+    def k(self) -> int:
+        return self.neighbors.shape[1]
+
+    def row_of(self, anime_id) -> Optional[int]:
+        return self._rows.get(int(anime_id)) if anime_id is not None else None
+
+    def lookup(self, anime_id, k: Optional[int] = None) -> Optional[List[Tuple[int, float]]]:
+        """(row, score) neighbours of the dataset anime `anime_id`, or None if it is not in the table"""
+        row = self.row_of(anime_id)
+        if row is None:
+            return None
+        return self.lookup_row(row, k)
+
+    def lookup_row(self, row: int, k: Optional[int] = None) -> List[Tuple[int, float]]:
+        """(row, score) neighbours of a row of the index"""
+        k = self.k if k is None else min(k, self.k)
+        return [(int(n), float(s)) for n, s in zip(self.neighbors[row, :k], self.scores[row, :k]) if n >= 0]
+
+    def save(self, path):
+        path = Path(path)
+        np.save(path / "neighbors.npy", self.neighbors)
+        np.save(path / "neighbor_scores.npy", self.scores)
+
+    @classmethod
+    def load(cls, path, anime_ids: np.ndarray, mmap_mode: Optional[str] = None) -> Optional["NeighborTable"]:
+        """the table stored next to an index, or None if it was never built"""
+        path = Path(path)
+        if not (path / "neighbors.npy").exists():
+            return None
+        return cls(anime_ids, np.load(path / "neighbors.npy", mmap_mode=mmap_mode),
+                   np.load(path / "neighbor_scores.npy", mmap_mode=mmap_mode))
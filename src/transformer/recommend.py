@@ -0,0 +1,159 @@
+import asyncio
+from typing import Dict, Iterable, Iterator, List, Optional
+import numpy as np
+
+from src.transformer.index import CorpusIndex
+from src.transformer.neighbors import batch_top_k
+from src.transformer.sparse import CSRMatrix
+from src.utils import tracing
+
+
+def read_queries(lines: Iterable[str]) -> List[str]:
+    """one query per line (an id or a title); blank lines and # comments are skipped"""
+    queries = []
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            queries.append(line)
+    return queries
+
+
+async def _fetch_each(transformer, anilist_ids: List[int]) -> Dict[int, str]:
+    """
+    get_by_id for every id not cached yet, after the batched fetch failed.
+    returns {id: error message} for the ids anilist could not be asked about.
+    """
+    from src.api.client import UPSTREAM_ERRORS
+
+    failed = {}
+    semaphore = asyncio.Semaphore(transformer.max_concurrency)
+
+    async def fetch(anilist_id: int):
+        async with semaphore:
+            try:
+                transformer.anime_cache[anilist_id] = await transformer.api.anilist.get_by_id(anilist_id)
+            except UPSTREAM_ERRORS as e:
+                failed[anilist_id] = f"anilist request failed: {str(e) or type(e).__name__}"
+
+    await asyncio.gather(*(fetch(anilist_id) for anilist_id in dict.fromkeys(anilist_ids)
+                           if anilist_id not in transformer.anime_cache))
+    return failed
+
+
+@tracing.traced("recommend.resolve")
+async def resolve_queries(index: CorpusIndex, queries: List[str], id_type: str = "anilist",
+                          handle_episodes: bool = True) -> List[dict]:
+    """
+    turn each query into {'query', 'row' or 'vector', ...} or {'query', 'error'}.
+    titles are looked up in the dataset (exact, prefix, then fuzzy). ids are MAL ids (the dataset
+    anime_id) with id_type="mal", else AniList ids: fetched in batches and matched to a dataset row
+    by MAL id (or a unique exact title when anilist has none), and animes outside the dataset are vectorized from their AniList synopsis.
+    when anilist fails, the ids are retried one by one and the ones still failing get
+    'anilist request failed: ...' instead of looking like unknown ids.
+    """
+    from src.api.client import UPSTREAM_ERRORS
+
+    title_index = index.title_index
+    transformer = index.transformer
+    resolved = []
+    anilist_ids = [int(query) for query in queries if query.isdigit()] if id_type == "anilist" else []
+    failed = {}
+    try:
+        await transformer.prefetch_animes(anilist_ids)
+    except UPSTREAM_ERRORS as e:
+        print(f"⚠️ Batch anime fetch failed, retrying one id at a time: {e}")
+        failed = await _fetch_each(transformer, anilist_ids)
+    missing = []
+    for query in queries:
+        entry = {"query": query}
+        if query.isdigit() and id_type == "anilist":
+            anilist_id = int(query)
+            anime = transformer.anime_cache.get(anilist_id)
+            entry["anilist_id"] = anilist_id
+            if anilist_id in failed:
+                entry["error"] = failed[anilist_id]
+            elif anime is None:
+                entry["error"] = "unknown anilist id"
+            else:
+                variants = [anime.get("title_romaji"), anime.get("title_english"), anime.get("title_native")]
+                entry["row"] = title_index.resolve(anilist_id, anime.get("id_mal"), variants)
+                if entry["row"] is None:
+                    entry["title"] = next((title for title in variants if title), None)
+                    missing.append(entry)
+        elif query.isdigit():
+            entry["row"] = title_index.row_of(int(query))
+            if entry["row"] is None:
+                entry["error"] = "anime_id not in the dataset"
+        else:
+            rows = title_index.search(query, limit=1)
+            if rows:
+                entry["row"] = rows[0]
+            else:
+                entry["error"] = "title not found in the dataset"
+        if entry.get("row") is None:
+            entry.pop("row", None)
+        resolved.append(entry)
+    if missing:
+        docs = await transformer.create_docs([(entry["anilist_id"], entry["title"]) for entry in missing],
+                                             handle_episodes=handle_episodes)
+        for entry, doc in zip(missing, docs):
+            if doc:
+                entry["vector"] = transformer.transform_query(doc)
+            else:
+                entry["error"] = "no synopsis for this anime"
+    return resolved
+
+
+def recommend(index: CorpusIndex, resolved: List[dict], k: int = 10, block_rows: int = 256) -> Iterator[dict]:
+    """
+    the k most similar dataset animes of every resolved query, in input order.
+    all queries are stacked into one query matrix and scored with a blocked sparse product
+    against the corpus (queries x corpus.T), `block_rows` queries at a time; results are
+    yielded as soon as their block is done.
+    """
+    transformer = index.transformer
+    matrix = transformer.matrix
+    scored = [entry for entry in resolved if "error" not in entry]
+    rows = [matrix.row(entry["row"]) if "row" in entry else (entry["vector"].indices, entry["vector"].data)
+            for entry in scored]
+    queries = CSRMatrix.from_rows(rows, transformer.n_features)
+    exclude = np.array([entry.get("row", -1) for entry in scored], dtype=np.int64)
+    postings = transformer.inverted_index.postings if transformer.inverted_index is not None else matrix.transpose()
+
+    pending = iter(resolved)
+    blocks = batch_top_k(queries, postings, k, exclude_rows=exclude, skip=transformer.deleted, block_rows=block_rows)
+    while True:
+        with tracing.span("recommend.score_block"):
+            block = next(blocks, None)
+        if block is None:
+            break
+        _, neighbors, scores = block
+        done = 0
+        for entry in pending:
+            if "error" in entry:
+                yield _error_record(entry)
+                continue
+            yield _record(index, entry, neighbors[done], scores[done])
+            done += 1
+            if done == len(neighbors):
+                break
+    for entry in pending:
+        yield _error_record(entry)
+
+
+def _error_record(entry: dict) -> dict:
+    return {key: entry[key] for key in ("query", "anilist_id", "error") if key in entry}
+
+
+def _record(index: CorpusIndex, entry: dict, neighbors: np.ndarray, scores: np.ndarray) -> dict:
+    row: Optional[int] = entry.get("row")
+    record = {"query": entry["query"]}
+    if "anilist_id" in entry:
+        record["anilist_id"] = entry["anilist_id"]
+    record["anime_id"] = int(index.anime_ids[row]) if row is not None else None
+    record["title"] = index.titles[row] if row is not None else entry.get("title")
+    record["recommendations"] = [
+        {"anime_id": int(index.anime_ids[n]), "title": index.titles[n], "score": round(float(s), 6)}
+        for n, s in zip(neighbors.tolist(), scores.tolist()) if n >= 0
+    ]
+    return record
@@ -0,0 +1,265 @@
+from typing import Iterator, List, Tuple, Union
+import numpy as np
+
+
+class SparseVector:
+    """
+    a single sparse row: sorted column ids and their weights.
+    rows handed out by CSRMatrix are views, nothing gets copied.
+    """
+
+    __slots__ = ("indices", "data", "size")
+
+    def __init__(self, indices: np.ndarray, data: np.ndarray, size: int):
+        self.indices = indices
+        self.data = data
+        self.size = size
+
+    @property
+    def nnz(self) -> int:
+        return len(self.indices)
+
+    def norm(self) -> float:
+        return float(np.sqrt(np.dot(self.data, self.data)))
+
+    def dot(self, other: "SparseVector") -> float:
+        """sparse x sparse dot product, only touches the shared columns"""
+        _, left, right = np.intersect1d(self.indices, other.indices, assume_unique=True, return_indices=True)
+        return float(np.dot(self.data[left], other.data[right]))
+
+    def toarray(self) -> np.ndarray:
+        dense = np.zeros(self.size, dtype=np.float64)
+        dense[self.indices] = self.data
+        return dense
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __repr__(self) -> str:
+        return f"SparseVector(size={self.size}, nnz={self.nnz})"
+
+
+class CSRMatrix:
+    """
+    compressed sparse row matrix backed by three numpy arrays:
+      - indptr: row i lives in indices/data[indptr[i]:indptr[i + 1]]
+      - indices: column ids, sorted inside each row
+      - data: the weights
+    only stores the non zero tf-idf weights, so memory is O(nnz) instead of O(docs x vocab).
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, shape: Tuple[int, int]):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.shape = (int(shape[0]), int(shape[1]))
+        self._row_ids = None
+
+    @classmethod
+    def from_rows(cls, rows: List[Tuple[np.ndarray, np.ndarray]], n_cols: int) -> "CSRMatrix":
+        """build the matrix from a list of (indices, data) pairs, one per row"""
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        if rows:
+            np.cumsum([len(idx) for idx, _ in rows], out=indptr[1:])
+            indices = np.concatenate([idx for idx, _ in rows]).astype(np.int32, copy=False)
+            data = np.concatenate([val for _, val in rows]).astype(np.float64, copy=False)
+        else:
+            indices = np.zeros(0, dtype=np.int32)
+            data = np.zeros(0, dtype=np.float64)
+        return cls(indptr, indices, data, (len(rows), n_cols))
+
+    @property
+    def nnz(self) -> int:
+        return int(self.indptr[-1])
+
+    @property
+    def nbytes(self) -> int:
+        """memory used by the backing arrays"""
+        return self.indptr.nbytes + self.indices.nbytes + self.data.nbytes
+
+    def row_ids(self) -> np.ndarray:
+        """row id of every stored value, handy for np.bincount based reductions (cached)"""
+        if self._row_ids is None:
+            self._row_ids = np.repeat(np.arange(self.shape[0], dtype=np.int64), np.diff(self.indptr))
+        return self._row_ids
+
+    def dot(self, vec: Union[SparseVector, np.ndarray]) -> np.ndarray:
+        """matrix x vector product in one pass over the stored values, returns a dense array of len(rows)"""
+        dense = vec.toarray() if isinstance(vec, SparseVector) else np.asarray(vec, dtype=np.float64)
+        if dense.shape != (self.shape[1],):
+            raise ValueError(f"vector of size {dense.shape} does not match matrix with {self.shape[1]} columns")
+        return np.bincount(self.row_ids(), weights=self.data * dense[self.indices], minlength=self.shape[0])
+
+    def dot_rows(self, rows: np.ndarray, vec: Union[SparseVector, np.ndarray]) -> np.ndarray:
+        """
+        dot products of only the given rows with vec. sums in the same order as dot(),
+        so the scores match the full product bit for bit.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return np.zeros(0, dtype=np.float64)
+        dense = vec.toarray() if isinstance(vec, SparseVector) else np.asarray(vec, dtype=np.float64)
+        starts, ends = self.indptr[rows], self.indptr[rows + 1]
+        lengths = ends - starts
+        local = np.repeat(np.arange(len(rows)), lengths)
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        values = self.data[positions] * dense[self.indices[positions]]
+        return np.bincount(local, weights=values, minlength=len(rows))
+
+    def matmul(self, dense: np.ndarray, block_nnz: int = 1 << 18) -> np.ndarray:
+        """
+        matrix x dense matrix (n_cols x r) -> dense (n_rows x r).
+        works on blocks of rows holding about block_nnz values, so the temporary
+        (nnz x r) products never get bigger than block_nnz x r.
+        """
+        dense = np.asarray(dense, dtype=np.float64)
+        out = np.zeros((self.shape[0], dense.shape[1]), dtype=np.float64)
+        row = 0
+        while row < self.shape[0]:
+            end = int(np.searchsorted(self.indptr, self.indptr[row] + block_nnz, side="right")) - 1
+            end = min(max(end, row + 1), self.shape[0])
+            lo, hi = self.indptr[row], self.indptr[end]
+            if hi > lo:
+                contrib = self.data[lo:hi, None] * dense[self.indices[lo:hi]]
+                starts = self.indptr[row:end] - lo
+                non_empty = starts < self.indptr[row + 1:end + 1] - lo
+                out[row:end][non_empty] = np.add.reduceat(contrib, starts[non_empty], axis=0)
+            row = end
+        return out
+
+    def transpose(self) -> "CSRMatrix":
+        """
+        the transposed matrix, still in csr form (i.e. this matrix in csc form).
+        for a docs x terms matrix, row t of the result is the postings list of term t with doc ids ascending.
+        """
+        order = np.argsort(self.indices, kind="stable")
+        indptr = np.zeros(self.shape[1] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.indices, minlength=self.shape[1]), out=indptr[1:])
+        indices = self.row_ids()[order].astype(np.int32)
+        return CSRMatrix(indptr, indices, self.data[order], (self.shape[1], self.shape[0]))
+
+    def row(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        return (indices, data) of row i as views into the backing arrays.
+        this is the cheap accessor, use it instead of densifying rows.
+        """
+        if i < 0:
+            i += self.shape[0]
+        if not 0 <= i < self.shape[0]:
+            raise IndexError(f"row {i} out of range for matrix with {self.shape[0]} rows")
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    def getrow(self, i: int) -> SparseVector:
+        indices, data = self.row(i)
+        return SparseVector(indices, data, self.shape[1])
+
+    def slice_rows(self, start: int, stop: int) -> "CSRMatrix":
+        """rows [start, stop) as a new matrix sharing indices/data with this one"""
+        start, stop, _ = slice(start, stop).indices(self.shape[0])
+        stop = max(start, stop)
+        lo, hi = self.indptr[start], self.indptr[stop]
+        indptr = self.indptr[start:stop + 1] - lo
+        return CSRMatrix(indptr, self.indices[lo:hi], self.data[lo:hi], (stop - start, self.shape[1]))
+
+    def take_rows(self, rows: np.ndarray) -> "CSRMatrix":
+        """a new matrix made of the given rows, in that order (copies their values)"""
+        rows = np.asarray(rows, dtype=np.int64)
+        starts, ends = self.indptr[rows], self.indptr[rows + 1]
+        lengths = ends - starts
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        positions = np.repeat(starts - indptr[:-1], lengths) + np.arange(indptr[-1])
+        return CSRMatrix(indptr, self.indices[positions], self.data[positions], (len(rows), self.shape[1]))
+
+    def mask_rows(self, keep: np.ndarray) -> "CSRMatrix":
+        """same shape, but the rows where `keep` is False are emptied"""
+        mask = keep[self.row_ids()]
+        indptr = np.zeros(self.shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.row_ids()[mask], minlength=self.shape[0]), out=indptr[1:])
+        return CSRMatrix(indptr, self.indices[mask], self.data[mask], self.shape)
+
+    @classmethod
+    def vstack(cls, matrices: List["CSRMatrix"], n_cols: int) -> "CSRMatrix":
+        """stack matrices on top of each other; n_cols may be wider than any of them"""
+        offsets = np.cumsum([0] + [m.nnz for m in matrices])
+        indptr = np.concatenate([[0]] + [m.indptr[1:] - m.indptr[0] + offset for m, offset in zip(matrices, offsets)]).astype(np.int64)
+        indices = np.concatenate([m.indices for m in matrices]).astype(np.int32, copy=False)
+        data = np.concatenate([m.data for m in matrices]).astype(np.float64, copy=False)
+        return cls(indptr, indices, data, (sum(m.shape[0] for m in matrices), n_cols))
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[SparseVector, "CSRMatrix"]:
+        if isinstance(key, slice):
+            if key.step not in (None, 1):
+                raise ValueError("CSRMatrix only supports contiguous row slices")
+            return self.slice_rows(key.start if key.start is not None else 0,
+                                   key.stop if key.stop is not None else self.shape[0])
+        return self.getrow(int(key))
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __iter__(self) -> Iterator[SparseVector]:
+        for i in range(self.shape[0]):
+            yield self.getrow(i)
+
+    def toarray(self) -> np.ndarray:
+        """densify the whole matrix, only meant for debugging small matrices"""
+        dense = np.zeros(self.shape, dtype=np.float64)
+        for i in range(self.shape[0]):
+            indices, data = self.row(i)
+            dense[i, indices] = data
+        return dense
+
+    def __repr__(self) -> str:
+        return f"CSRMatrix(shape={self.shape}, nnz={self.nnz})"
+
+
+def select_top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    indices of the k highest scores, best first, ties broken by the lower index.
+    uses argpartition so only the k winners get sorted.
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        # argpartition does not care about ties at the boundary, pull in every index tied with the k-th score
+        kth = scores[candidates].min()
+        candidates = np.union1d(candidates[scores[candidates] > kth], np.flatnonzero(scores == kth))
+    else:
+        candidates = np.arange(len(scores))
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order[:k]]
+
+
+def blocked_product(left: CSRMatrix, right_postings: CSRMatrix, block_rows: int = 256,
+                    max_pairs: int = 1 << 22) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    yield (start row, dense block) of left @ right.T, `block_rows` rows of left at a time.
+    right_postings is right.transpose() (the postings view, see InvertedIndex); each
+    non-zero of left is expanded over the postings of its column, at most `max_pairs`
+    products at once, so memory stays at block_rows x len(right) plus a bounded buffer.
+    """
+    n_right = right_postings.shape[1]
+    for start in range(0, left.shape[0], block_rows):
+        block = left.slice_rows(start, start + block_rows)
+        out = np.zeros(block.shape[0] * n_right, dtype=np.float64)
+        terms = block.indices
+        lengths = right_postings.indptr[terms + 1] - right_postings.indptr[terms]
+        local_rows = block.row_ids()
+        total = np.cumsum(lengths)
+        lo = 0
+        while lo < len(terms):
+            # pega quantos nao-zeros couberem em max_pairs produtos (pelo menos um)
+            done = total[lo - 1] if lo else 0
+            hi = max(int(np.searchsorted(total, done + max_pairs, side="right")), lo + 1)
+            chunk_lengths = lengths[lo:hi]
+            starts = right_postings.indptr[terms[lo:hi]]
+            positions = np.repeat(starts - np.cumsum(chunk_lengths) + chunk_lengths, chunk_lengths) + np.arange(chunk_lengths.sum())
+            flat = np.repeat(local_rows[lo:hi], chunk_lengths) * n_right + right_postings.indices[positions]
+            values = np.repeat(block.data[lo:hi], chunk_lengths) * right_postings.data[positions]
+            out += np.bincount(flat, weights=values, minlength=len(out))
+            lo = hi
+        yield start, out.reshape(block.shape[0], n_right)
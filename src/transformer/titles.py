@@ -0,0 +1,187 @@
+import json
+import re
+import unicodedata
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+from src.transformer.sparse import select_top_k
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize_title(title: Optional[str]) -> str:
+    """
+    casefold, drop accents and punctuation, collapse whitespace.
+    works the same for romaji, english and native (kana / kanji are word characters) titles.
+    """
+    if not title or not isinstance(title, str):
+        return ""
+    if title.isascii():
+        text = title.lower()
+    else:
+        text = unicodedata.normalize("NFKD", unicodedata.normalize("NFKC", title).casefold())
+        text = "".join(char for char in text if not unicodedata.combining(char))
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def trigrams(normalized: str) -> set:
+    """character trigrams of a normalized title, padded so short titles still get some"""
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndex:
+    """
+    lookup table from titles (and ids) to dataset rows:
+      - exact: normalized title -> rows, a dict lookup
+      - prefix: bisect over the sorted normalized titles
+      - fuzzy: trigram postings, scored by dice similarity of the trigram sets
+    rows listed in `skip` (e.g. deleted rows of an updated index) are left out.
+    built from the titles, or loaded with load() from the files save() writes next to a corpus index.
+    """
+
+    def __init__(self, titles: List[str], anime_ids: Optional[Iterable[int]] = None, skip: Optional[np.ndarray] = None,
+                 _tables: Optional[tuple] = None):
+        self.titles = titles
+        self._ids: Dict[int, int] = {}
+        self._anilist: Dict[int, int] = {}  # anilist id -> linha, preenchido pelo resolve()
+        live = [skip is None or row >= len(skip) or not skip[row] for row in range(len(titles))]
+        if anime_ids is not None:
+            self._ids = {int(anime_id): row for row, anime_id in enumerate(anime_ids) if live[row]}
+        if _tables is None:
+            _tables = self._build(titles, live)
+        self._keys, self._key_rows, grams, self._gram_indptr, self._gram_rows, self._sizes = _tables
+        self._grams = {gram: idx for idx, gram in enumerate(grams)}
+        self._exact: Dict[str, List[int]] = {}
+        for key, row in zip(self._keys, self._key_rows):
+            self._exact.setdefault(key, []).append(row)
+
+    @staticmethod
+    def _build(titles: List[str], live: List[bool]) -> tuple:
+        keys = []
+        postings: Dict[str, List[int]] = {}
+        sizes = np.zeros(len(titles), dtype=np.float64)
+        for row, title in enumerate(titles):
+            key = normalize_title(title) if live[row] else ""
+            if not key:
+                continue
+            keys.append((key, row))
+            grams = trigrams(key)
+            sizes[row] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(row)
+        keys.sort()
+        grams = sorted(postings)
+        # postings de todos os trigramas num array so, no formato csr
+        indptr = np.zeros(len(grams) + 1, dtype=np.int64)
+        np.cumsum([len(postings[gram]) for gram in grams], out=indptr[1:])
+        rows = np.fromiter((row for gram in grams for row in postings[gram]), dtype=np.int64, count=int(indptr[-1]))
+        return [key for key, _ in keys], [row for _, row in keys], grams, indptr, rows, sizes
+
+    def save(self, path):
+        path = Path(path)
+        with open(path / "title_index.json", "w", encoding="utf-8") as f:
+            json.dump({"keys": self._keys, "rows": self._key_rows, "grams": sorted(self._grams, key=self._grams.get)},
+                      f, ensure_ascii=False)
+        np.save(path / "title_gram_indptr.npy", self._gram_indptr)
+        np.save(path / "title_gram_rows.npy", self._gram_rows)
+        np.save(path / "title_sizes.npy", self._sizes)
+
+    @classmethod
+    def load(cls, path, titles: List[str], anime_ids: Optional[Iterable[int]] = None,
+             skip: Optional[np.ndarray] = None) -> Optional["TitleIndex"]:
+        """the index saved next to a corpus index, or None if there is none"""
+        path = Path(path)
+        if not (path / "title_index.json").exists():
+            return None
+        with open(path / "title_index.json", "r", encoding="utf-8") as f:
+            tables = json.load(f)
+        return cls(titles, anime_ids, skip, _tables=(
+            tables["keys"], tables["rows"], tables["grams"],
+            np.load(path / "title_gram_indptr.npy"), np.load(path / "title_gram_rows.npy"),
+            np.load(path / "title_sizes.npy"),
+        ))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def row_of(self, anime_id) -> Optional[int]:
+        """row of a dataset anime_id (MAL id)"""
+        return self._ids.get(int(anime_id)) if anime_id is not None else None
+
+    def exact(self, title: str) -> List[int]:
+        return list(self._exact.get(normalize_title(title), []))
+
+    def prefix(self, title: str, limit: int = 10) -> List[int]:
+        """rows whose normalized title starts with `title`, in title order"""
+        key = normalize_title(title)
+        if not key:
+            return []
+        rows = []
+        for pos in range(bisect_left(self._keys, key), len(self._keys)):
+            if len(rows) >= limit or not self._keys[pos].startswith(key):
+                break
+            rows.append(self._key_rows[pos])
+        return rows
+
+    def fuzzy(self, title: str, limit: int = 10, min_score: float = 0.3) -> List[Tuple[int, float]]:
+        """(row, dice similarity) of the titles sharing the most trigrams with `title`, best first"""
+        key = normalize_title(title)
+        if not key:
+            return []
+        grams = trigrams(key)
+        hits = [self._gram_rows[self._gram_indptr[idx]:self._gram_indptr[idx + 1]]
+                for idx in (self._grams.get(gram) for gram in grams) if idx is not None]
+        if not hits:
+            return []
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.titles))
+        scores = np.zeros(len(self.titles), dtype=np.float64)
+        candidates = np.flatnonzero(shared)
+        scores[candidates] = 2 * shared[candidates] / (len(grams) + self._sizes[candidates])
+        return [(int(row), float(scores[row])) for row in select_top_k(scores, limit) if scores[row] >= min_score]
+
+    def search(self, title: str, limit: int = 10) -> List[int]:
+        """exact matches first, then prefix matches, then fuzzy ones"""
+        rows = self.exact(title)
+        for row in self.prefix(title, limit):
+            if row not in rows:
+                rows.append(row)
+        if len(rows) < limit:
+            for row, _ in self.fuzzy(title, limit):
+                if row not in rows:
+                    rows.append(row)
+        return rows[:limit]
+
+    def resolve(self, anilist_id: Optional[int] = None, mal_id: Optional[int] = None,
+                titles: Iterable[Optional[str]] = (), fuzzy_score: Optional[float] = None) -> Optional[int]:
+        """
+        the dataset row of an anilist entry. the MAL id (the dataset anime_id) is authoritative:
+        when anilist gives one that is not in the dataset, neither is the anime (a title match would
+        be a sibling season). without a MAL id, a title variant (romaji / english / native) must match
+        exactly one row; "Gintama'" and "Gintama." normalize alike, so ambiguous titles resolve to None.
+        a fuzzy match (dice >= fuzzy_score) is only tried when fuzzy_score is given.
+        the result is remembered under the anilist id.
+        """
+        if anilist_id is not None and anilist_id in self._anilist:
+            return self._anilist[anilist_id]
+        if mal_id is not None:
+            row = self.row_of(mal_id)
+        else:
+            row = None
+            titles = [title for title in titles if title]
+            for title in titles:
+                rows = self.exact(title)
+                if len(rows) == 1:
+                    row = rows[0]
+                    break
+            if row is None and fuzzy_score is not None:
+                for title in titles:
+                    matches = self.fuzzy(title, limit=1, min_score=fuzzy_score)
+                    if matches:
+                        row = matches[0][0]
+                        break
+        if anilist_id is not None and row is not None:
+            self._anilist[anilist_id] = row
+        return row
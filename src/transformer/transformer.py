@@ -1,11 +1,77 @@
+import asyncio
+import json
+import os
 import re
-from typing import List, Optional
-from src.utils.proxy import get_or_create_stopwords
+import string
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+from src.utils import tracing
 from src.utils.remove_html_tags import remove_html_tags
+from src.transformer.sparse import CSRMatrix, SparseVector, select_top_k
 import numpy as np
 
 
-ENGLISH_STOPWORDS = set(get_or_create_stopwords())
+# bump when preprocess() changes the tokens it produces, so saved indexes get rebuilt
+TOKENIZER_VERSION = 1
+
+# tags html e tudo que nao for letra/espaco saem na mesma passada (depois do lower)
+_STRIP_PATTERN = re.compile(r'<[^>]+>|[^a-z\s]')
+# \x1c-\x1f sao espaco pro str.split() mas viram token no wordpunct_tokenize, raro mas tratado igual
+_SEPARATORS = ('\x1c', '\x1d', '\x1e', '\x1f')
+_WORDPUNCT_PATTERN = re.compile(r'[a-z]+|[\x1c-\x1f]+')
+# carregadas no primeiro tokenize (ou get_stopwords), nao no import: sem cache isso baixa o zip do nltk
+_stopwords: Optional[frozenset] = None
+# stopwords + todo token de 1 ou 2 letras: um unico lookup no set filtra os dois casos
+_dropped_tokens: Optional[frozenset] = None
+
+
+def get_stopwords() -> frozenset:
+    """the english stopwords, read from the cache file (or downloaded) the first time they are needed"""
+    global _stopwords, _dropped_tokens
+    if _stopwords is None:
+        from src.utils.proxy import get_or_create_stopwords
+
+        stopwords = frozenset(get_or_create_stopwords())
+        _dropped_tokens = stopwords | frozenset(string.ascii_lowercase) | frozenset(
+            a + b for a in string.ascii_lowercase for b in string.ascii_lowercase)
+        _stopwords = stopwords
+    return _stopwords
+
+
+def __getattr__(name: str):
+    # ENGLISH_STOPWORDS continua importavel, mas so carrega quando alguem usa
+    if name == "ENGLISH_STOPWORDS":
+        return get_stopwords()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    remove html, lowercase, drop special chars, tokenize and remove stopwords / short tokens.
+    one compiled sub does the tag and character stripping, what is left is only a-z runs and
+    whitespace, so str.split() gives the same tokens nltk.wordpunct_tokenize would.
+    tokens stay strings: preprocess_many runs this in worker processes, each would intern
+    different ids, so ids are only assigned in fit() (intern_tokens) against one shared table.
+    """
+    if not text or not isinstance(text, str):
+        return []
+    if _dropped_tokens is None:
+        get_stopwords()
+    text = _STRIP_PATTERN.sub('', text.lower())
+    if any(separator in text for separator in _SEPARATORS):
+        return [token for token in _WORDPUNCT_PATTERN.findall(text) if token not in _stopwords and len(token) >= 3]
+    return [token for token in text.split() if token not in _dropped_tokens]
+
+
+def intern_tokens(tokens: List[str], ids: dict) -> np.ndarray:
+    """token ids of a document, new tokens get the next id in `ids` (token -> id)"""
+    return np.fromiter((ids.setdefault(token, len(ids)) for token in tokens), dtype=np.int64, count=len(tokens))
+
+
+def _tokenize_chunk(texts: List[str]) -> List[List[str]]:
+    # top level pra poder ser enviado aos processos do pool
+    return [tokenize(text) for text in texts]
 
 class Transformer:
     """
@@ -13,15 +79,26 @@ class Transformer:
     analyzes anime synopses and episodes summaries to find similar content.
     """
     
-    def __init__(self, min_df: int = 1, max_df: float = 0.95):
+    def __init__(self, min_df: int = 1, max_df: float = 0.95, max_concurrency: int = 8):
         self.min_df = min_df
         self.max_df = max_df
-        self.vocabulary = {}  
-        self.idf_values = {}  
+        self.max_concurrency = max_concurrency  # animes buscados ao mesmo tempo em create_docs
+        self.vocabulary = {}  # termo -> coluna
+        self.idf_values = np.zeros(0)  # idf por coluna, 0 pros termos filtrados
         self.document_count = 0
+        self.matrix = None  # matriz tf-idf do corpus, preenchida pelo fit
+        self.inverted_index = None  # postings do corpus, ver build_inverted_index()
+        self._rebuild_inverted = False  # o indice invertido foi descartado por uma atualizacao, o compact() refaz
+        # estado pras atualizacoes incrementais (add_documents / delete_documents)
+        self.counts = None  # term counts crus de cada linha, o tf-idf sai daqui
+        self.document_frequencies = np.zeros(0, dtype=np.int64)  # df por coluna, so docs vivos
+        self.deleted = np.zeros(0, dtype=bool)  # linhas apagadas, recuperadas pelo compact()
+        self._pending = []  # linhas adicionadas que ainda nao entraram em counts
+        self._stale = False  # idf / matrix precisam ser recalculados
+        self.metadata = {}
         self.is_fitted = False
         self.anime_cache = {}  # cache pra anime
-        self.episodes_cache = {}  # cache pra episodios
+        self.episodes_cache = {}  # cache pra episodios: anime_id -> resposta do ani.zip
         # iniciando api clients, util pra nao ficar criando novos clientes toda hora
         from src.api.client import APIManager
         self.api = APIManager()
@@ -37,7 +114,8 @@ class Transformer:
         """
         try:
             if anime_id in self.anime_cache:
-                synopsis = self.anime_cache[anime_id].get("description")
+                # None = anilist nao conhece esse id (cache negativo)
+                synopsis = (self.anime_cache[anime_id] or {}).get("description")
                 return remove_html_tags(synopsis) if synopsis else None
             try:
                 anime = await self.api.anilist.get_by_id(anime_id)
@@ -55,6 +133,26 @@ class Transformer:
             print(f"❌ Error fetching synopsis for anime ID {anime_id}: {e}")
             return None
 
+    async def prefetch_animes(self, anime_ids: Iterable[int]):
+        """
+        fill anime_cache for many ids with batched anilist queries (get_by_ids).
+        ids anilist does not know are cached as None so they are not asked for again.
+        anilist failures (network, error status, open circuit breaker) are raised, nothing is cached then.
+        """
+        missing = [anime_id for anime_id in anime_ids if anime_id not in self.anime_cache]
+        if not missing:
+            return
+        self.anime_cache.update(await self.api.anilist.get_by_ids(missing))
+
+    async def get_mappings(self, anime_id: int) -> Optional[dict]:
+        """
+        fetch the ani.zip mappings of an anime once and keep them in episodes_cache,
+        every episode summary of that anime is read from this single response.
+        """
+        if anime_id not in self.episodes_cache:
+            self.episodes_cache[anime_id] = await self.api.anizip.get_mappings(anime_id)
+        return self.episodes_cache[anime_id]
+
     async def get_episode_summary(self, anime_id: int, episode_number: int) -> Optional[str]:
         """
         fetch and return the summary for a given anime ID and episode number.
@@ -62,19 +160,13 @@ class Transformer:
         """
         try:
             episode_key = str(episode_number)
-            cache_key = f"{anime_id}_{episode_key}"
-            if cache_key in self.episodes_cache:
-                synopsis = self.episodes_cache[cache_key].get("synopsis")
-                return remove_html_tags(synopsis) if synopsis else None
             try:
-                response = await self.api.anizip.get_mappings(anime_id)
+                response = await self.get_mappings(anime_id)
                 if response and "episodes" in response:
                     episodes_data = response["episodes"]
                     if episode_key in episodes_data:
                         episode_data = episodes_data[episode_key]
                         synopsis = episode_data.get("summary") or episode_data.get("overview")
-                        #caching
-                        self.episodes_cache[cache_key] = {"synopsis": synopsis}
                         return remove_html_tags(synopsis) if synopsis else None
                     else:
                         print(f"⚠️ Episode {episode_number} not found for anime ID {anime_id}")
@@ -88,22 +180,50 @@ class Transformer:
             print(f"❌ Error fetching episode summary for anime ID {anime_id}, episode {episode_number}: {e}")
             return None
 
+    def extract_episode_summaries(self, mappings: Optional[dict]) -> List[Tuple[int, Optional[str]]]:
+        """(episode number, cleaned summary) of every regular episode in a mappings response, in order"""
+        episodes_data = mappings.get("episodes", {}) if mappings else {}
+        summaries = []
+        for episode_num in sorted(int(k) for k in episodes_data.keys() if k.isdigit()):
+            episode_data = episodes_data[str(episode_num)]
+            synopsis = episode_data.get("summary") or episode_data.get("overview")
+            summaries.append((episode_num, remove_html_tags(synopsis) if synopsis else None))
+        return summaries
+
     async def preprocess(self, text: str) -> List[str]:
         """preprocess text: remove html, tokenize, remove stopwords, special chars, etc."""
-        if not text or not isinstance(text, str):
-            return []
-        text = remove_html_tags(text)
-        text = text.lower()
-        text = re.sub(r'[^a-z\s]', '', text)
-        import nltk
-        tokens = nltk.wordpunct_tokenize(text)
-        tokens = [token for token in tokens if token not in ENGLISH_STOPWORDS and len(token) >= 3]
+        with tracing.span("transformer.preprocess"):
+            tokens = tokenize(text)
+        tracing.count("transformer.tokens", len(tokens))
         return tokens
 
+    def preprocess_many(self, texts: Iterable[str], workers: Optional[int] = None, chunksize: int = 256) -> List[List[str]]:
+        """
+        preprocess a whole corpus, returning one token list per text in input order.
+        chunks of `chunksize` texts are spread over `workers` processes (default: one per cpu);
+        the output is exactly what preprocess() gives for each text.
+        """
+        texts = list(texts)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        with tracing.span("transformer.preprocess_many", documents=len(texts), workers=workers):
+            if workers <= 1 or len(texts) <= chunksize:
+                return _tokenize_chunk(texts)
+            get_stopwords()  # carrega antes do pool, os processos herdam em vez de ler de novo
+            chunks = [texts[i:i + chunksize] for i in range(0, len(texts), chunksize)]
+            results = []
+            with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+                for tokens in pool.map(_tokenize_chunk, chunks):
+                    results.extend(tokens)
+            return results
+
+    @tracing.traced("transformer.create_doc")
     async def create_doc(self, anime_id: int, anime_title: str, handle_episodes: bool = False, dataset_synopsis: Optional[str] = None):
         """
         creates a document for the anime. If handle_episodes=True, includes synopsis + all episodes (uses API);
         if False, uses only the dataset synopsis (dataset_synopsis).
+        synopsis and episode list are fetched concurrently, and all episode summaries come
+        from the single ani.zip mappings response.
         """
         try:
             #print(f"📚 Creating document for {anime_title} (handle_episodes={handle_episodes})...")
@@ -111,9 +231,16 @@ class Transformer:
                 # usa a sinopse do dataset diretamente
                 combined_document = dataset_synopsis
             else:
-                # busca sinopse e episódios via api
-                synopsis = await self.get_anime_synopsis(anime_id, anime_title)
-                if not synopsis:
+                # busca sinopse e episódios via api, ao mesmo tempo
+                async def no_mappings():
+                    return None
+                with tracing.span("transformer.create_doc.fetch", anime_id=anime_id):
+                    synopsis, mappings = await asyncio.gather(
+                        self.get_anime_synopsis(anime_id, anime_title),
+                        self.get_mappings(anime_id) if handle_episodes else no_mappings(),
+                        return_exceptions=True,
+                    )
+                if isinstance(synopsis, Exception) or not synopsis:
                     print(f"  ⚠️ Could not fetch synopsis for '{anime_title}'. (Not found in API or network error.)")
                     print(f"     Dica: Verifique se o anime existe na base de dados da API ou se há problemas de conexão.")
                     synopsis = ""
@@ -121,14 +248,11 @@ class Transformer:
                     print(f"\n  ✅ Fetched synopsis ({len(synopsis)} chars)")
                 combined_document = synopsis
                 if handle_episodes:
-                    episode_summaries = []
-                    try:
-                        response = await self.api.anizip.get_mappings(anime_id)
-                        episodes_data = response.get("episodes", {}) if response else {}
-                        episode_keys = [int(k) for k in episodes_data.keys() if k.isdigit()]
-                        episode_keys.sort()
-                        for episode_num in episode_keys:
-                            summary = await self.get_episode_summary(anime_id, episode_num)
+                    if isinstance(mappings, Exception):
+                        print(f"  ⚠️ Could not fetch episode list: {mappings}")
+                    else:
+                        episode_summaries = []
+                        for episode_num, summary in self.extract_episode_summaries(mappings):
                             if summary:
                                 episode_summaries.append(summary)
                                 print(f"  ✅ Episode {episode_num}: {len(summary)} chars")
@@ -137,65 +261,422 @@ class Transformer:
                         print(f"  📊 Total episodes fetched: {len(episode_summaries)}")
                         if episode_summaries:
                             combined_document += " " + " ".join(episode_summaries)
-                    except Exception as e:
-                        print(f"  ⚠️ Could not fetch episode list: {e}")
             preprocessed_tokens = await self.preprocess(combined_document)
             return preprocessed_tokens
         except Exception as e:
             print(f"❌ Error creating anime document for {anime_title}: {e}")
             return []
-        
-    async def transform(self, documents: List[List[str]]):
+
+    async def create_docs(self, animes: Iterable[Tuple[int, str]], handle_episodes: bool = True,
+                          concurrency: Optional[int] = None) -> List[List[str]]:
         """
-        vectorize the docs using TF-IDF
-        each document is a list of tokens
-        """
-        processed_docs = documents 
-        vocab = set()
-        for tokens in processed_docs:
-            vocab.update(tokens)
-        vocab = sorted(vocab)
-        self.vocabulary = {word: idx for idx, word in enumerate(vocab)}
-        self.document_count = len(processed_docs)
-        
+        create_doc for many (anime_id, title) pairs at once, in input order.
+        at most `concurrency` animes (default self.max_concurrency) are fetched at the same time.
+        if the batched anilist fetch fails, each anime is fetched on its own by create_doc.
+        """
+        from src.api.client import UPSTREAM_ERRORS
+
+        animes = list(animes)
+        try:
+            await self.prefetch_animes(anime_id for anime_id, _ in animes)
+        except UPSTREAM_ERRORS as e:
+            # sem o lote, cada create_doc abaixo busca o seu anime com get_by_id
+            print(f"⚠️ Batch anime fetch failed, falling back to one request per anime: {e}")
+        semaphore = asyncio.Semaphore(concurrency or self.max_concurrency)
+
+        async def bounded(anime_id: int, anime_title: str):
+            async with semaphore:
+                return await self.create_doc(anime_id, anime_title, handle_episodes=handle_episodes)
 
-        # calcula df
-        from collections import Counter
-        df = Counter()
-        for tokens in processed_docs:
-            unique_tokens = set(tokens)
-            for token in unique_tokens:
-                df[token] += 1
-
-        import math
-        for word in vocab:
-            doc_freq = df[word]
-            if doc_freq < self.min_df:
-                continue
-            if doc_freq / self.document_count > self.max_df:
-                continue
-            self.idf_values[word] = math.log((1 + self.document_count) / (1 + doc_freq)) + 1
-
-        # calcula tf-idf para cada documento
-        tfidf_matrix = []
-        for tokens in processed_docs:
-            tf = Counter(tokens)
-            doc_vec = []
-            for word in self.idf_values:
-                tf_val = tf[word]
-                idf_val = self.idf_values[word]
-                doc_vec.append(tf_val * idf_val)
-            norm = np.linalg.norm(doc_vec)
-            if norm > 0:
-                doc_vec = [v / norm for v in doc_vec]
-            tfidf_matrix.append(doc_vec)
+        return await asyncio.gather(*(bounded(anime_id, title) for anime_id, title in animes))
+
+    def fit(self, documents: List[List[str]]) -> "Transformer":
+        """
+        fit vocabulary, idf_values and the corpus matrix on a list of token lists.
+        queries are then projected with transform_query(), and the corpus itself is changed
+        with add_documents() / delete_documents() / update_document() instead of refitting everything.
+        """
+        with tracing.span("transformer.fit", documents=len(documents)):
+            with tracing.span("transformer.fit.vocabulary"):
+                interned = {}
+                token_ids = [intern_tokens(tokens, interned) for tokens in documents]
+                vocab = sorted(interned)
+                self.vocabulary = {word: idx for idx, word in enumerate(vocab)}
+                # id interno (ordem de chegada) -> coluna (ordem alfabetica)
+                columns = np.empty(len(vocab), dtype=np.int64)
+                columns[np.fromiter((interned[word] for word in vocab), dtype=np.int64, count=len(vocab))] = np.arange(len(vocab))
+
+            # term counts de cada documento, ja no formato csr
+            with tracing.span("transformer.fit.count"):
+                counts = self._count_columns([columns[ids] for ids in token_ids], len(vocab))
+            with tracing.span("transformer.fit.weigh"):
+                return self._fit_counts(counts)
+
+    @staticmethod
+    def _count_columns(documents: List[np.ndarray], n_cols: int) -> CSRMatrix:
+        """
+        term count matrix from the column ids of every document, counted for the whole
+        corpus at once: np.unique over (row, column) keys gives the csr entries already sorted.
+        a np.bincount over the same keys would need n_rows * n_cols bins (~0.7G for 17k docs x
+        40k terms) and one bincount per document is ~25x slower, so the sort stays.
+        """
+        n_rows = len(documents)
+        lengths = np.fromiter((len(ids) for ids in documents), dtype=np.int64, count=n_rows)
+        if not lengths.sum():
+            return CSRMatrix.from_rows([], n_cols) if not n_rows else CSRMatrix(
+                np.zeros(n_rows + 1, dtype=np.int64), np.zeros(0, dtype=np.int32), np.zeros(0), (n_rows, n_cols))
+        keys = np.repeat(np.arange(n_rows, dtype=np.int64), lengths) * n_cols + np.concatenate(documents)
+        keys, counts = np.unique(keys, return_counts=True)
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // n_cols, minlength=n_rows), out=indptr[1:])
+        return CSRMatrix(indptr, (keys % n_cols).astype(np.int32), counts.astype(np.float64), (n_rows, n_cols))
+
+    def _fit_counts(self, counts: CSRMatrix) -> "Transformer":
+        """fit idf_values and the corpus matrix on a term count matrix (one row per document)"""
+        # df = em quantos docs cada termo aparece; termos fora de min_df/max_df ficam com idf 0
+        self.document_count = counts.shape[0]
+        self.counts = counts
+        self.document_frequencies = np.bincount(counts.indices, minlength=counts.shape[1]).astype(np.int64)
+        self.deleted = np.zeros(self.document_count, dtype=bool)
+        self._pending = []
+        self._stale = False
+        self._compute_idf()
+
+        self.matrix = self._weigh(counts)
+        self.inverted_index = None
+        self._rebuild_inverted = False
         self.is_fitted = True
-        return tfidf_matrix
-    
+        return self
+
+    def _compute_idf(self):
+        """idf_values from document_frequencies and the number of live documents"""
+        df = self.document_frequencies
+        keep = df >= self.min_df
+        if self.document_count:
+            keep &= df / self.document_count <= self.max_df
+        self.idf_values = np.where(keep, np.log((1 + self.document_count) / (1 + df)) + 1, 0.0)
+
+    @property
+    def matrix(self) -> Optional[CSRMatrix]:
+        """the tf-idf matrix of the corpus, re-weighed first if documents changed since the last read"""
+        self._sync()
+        return self._matrix
+
+    @matrix.setter
+    def matrix(self, value: Optional[CSRMatrix]):
+        self._matrix = value
+
+    @property
+    def n_features(self) -> int:
+        """number of columns of the tf-idf space"""
+        return len(self.vocabulary)
+
+    @property
+    def n_rows(self) -> int:
+        """rows of the corpus matrix, deleted ones included until compact()"""
+        if self.counts is None:
+            return self._matrix.shape[0] if self._matrix is not None else 0
+        return self.counts.shape[0] + len(self._pending)
+
+    def _sync(self):
+        """
+        apply pending updates: merge the added rows, recompute idf from the current
+        document frequencies and re-weigh (and re-normalize) every row. deleted rows end
+        up empty. runs lazily, so a batch of updates costs a single refresh.
+        """
+        if not self._stale:
+            return
+        self._merge_pending()
+        self._compute_idf()
+        counts = self.counts.mask_rows(~self.deleted) if self.deleted.any() else self.counts
+        self._stale = False
+        self._matrix = self._weigh(counts)
+        if self.inverted_index is not None:
+            # refazer as postings custa mais que a propria atualizacao, ate o compact() o top_k usa forca bruta
+            self.inverted_index = None
+            self._rebuild_inverted = True
+
+    def _merge_pending(self):
+        """move the added rows into counts, widened to the current vocabulary"""
+        n_cols = self.n_features
+        if self._pending:
+            self.counts = CSRMatrix.vstack([self.counts, CSRMatrix.from_rows(self._pending, n_cols)], n_cols)
+            self._pending = []
+        elif self.counts.shape[1] != n_cols:
+            self.counts = CSRMatrix(self.counts.indptr, self.counts.indices, self.counts.data, (self.counts.shape[0], n_cols))
+
+    def _check_updatable(self):
+        if not self.is_fitted:
+            raise RuntimeError("Transformer is not fitted, call fit() first")
+        if self.counts is None:
+            raise RuntimeError("this index has no term counts, refit it to update it incrementally")
+        # arrays vindos de um load com mmap sao read only
+        if not self.document_frequencies.flags.writeable:
+            self.document_frequencies = np.array(self.document_frequencies)
+        if not self.deleted.flags.writeable:
+            self.deleted = np.array(self.deleted)
+
+    def add_documents(self, documents: List[List[str]]) -> List[int]:
+        """
+        append documents to the fitted corpus without refitting, returns their row ids.
+        new terms get new columns at the end of the vocabulary; idf and row norms are
+        recomputed lazily on the next query (see _sync).
+        """
+        self._check_updatable()
+        first = self.n_rows
+        rows = []
+        for tokens in documents:
+            self._add_terms(tokens)
+            rows.append(self._count(tokens))
+        if not rows:
+            return []
+        df = np.zeros(self.n_features, dtype=np.int64)
+        df[:len(self.document_frequencies)] = self.document_frequencies
+        df += np.bincount(np.concatenate([cols for cols, _ in rows]), minlength=len(df))
+        self.document_frequencies = df
+        self.deleted = np.concatenate([self.deleted, np.zeros(len(rows), dtype=bool)])
+        self._pending.extend(rows)
+        self.document_count += len(rows)
+        self._stale = True
+        return list(range(first, first + len(rows)))
+
+    def _add_terms(self, tokens: List[str]):
+        """give unseen terms a column at the end of the vocabulary"""
+        for word in tokens:
+            if word not in self.vocabulary:
+                self.vocabulary[word] = len(self.vocabulary)
+
+    def _row_counts(self, row: int) -> Tuple[np.ndarray, np.ndarray]:
+        if row < self.counts.shape[0]:
+            return self.counts.row(row)
+        return self._pending[row - self.counts.shape[0]]
+
+    def delete_documents(self, rows: Iterable[int]):
+        """
+        remove rows from the corpus. they are only marked as deleted: ids of the other rows
+        do not change, deleted rows score 0 and never show up in top_k. compact() reclaims them.
+        """
+        self._check_updatable()
+        rows = np.unique(np.fromiter(rows, dtype=np.int64))
+        if len(rows) and (rows[0] < 0 or rows[-1] >= self.n_rows):
+            raise IndexError(f"rows out of range for corpus with {self.n_rows} rows")
+        rows = rows[~self.deleted[rows]]
+        if not len(rows):
+            return
+        cols = np.concatenate([self._row_counts(int(row))[0] for row in rows])
+        self.document_frequencies -= np.bincount(cols, minlength=len(self.document_frequencies))
+        self.deleted[rows] = True
+        self.document_count -= len(rows)
+        self._stale = True
+
+    def update_document(self, row: int, tokens: List[str]) -> int:
+        """replace the document at `row`; the new version gets a new row id, which is returned"""
+        self.delete_documents([row])
+        return self.add_documents([tokens])[0]
+
+    def compact(self) -> np.ndarray:
+        """
+        drop deleted rows and the terms no live document uses anymore.
+        returns old row id -> new row id (-1 for deleted rows) so callers can remap their tables.
+        """
+        self._check_updatable()
+        self._merge_pending()
+        keep = ~self.deleted
+        mapping = np.full(len(keep), -1, dtype=np.int64)
+        mapping[keep] = np.arange(int(keep.sum()))
+        self.counts = self._drop_unused_terms(self.counts.take_rows(np.flatnonzero(keep)))
+        self.deleted = np.zeros(self.counts.shape[0], dtype=bool)
+        self._stale = True
+        self._sync()
+        if self._rebuild_inverted:
+            self.build_inverted_index()
+        return mapping
+
+    def _drop_unused_terms(self, counts: CSRMatrix) -> CSRMatrix:
+        """remove the terms no live document uses anymore, the remaining columns keep their order"""
+        used = self.document_frequencies > 0
+        if used.all():
+            return counts
+        columns = np.cumsum(used) - 1
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        self.vocabulary = {word: int(columns[idx]) for idx, word in enumerate(terms) if used[idx]}
+        self.document_frequencies = self.document_frequencies[used]
+        return CSRMatrix(counts.indptr, columns[counts.indices].astype(np.int32), counts.data,
+                         (counts.shape[0], self.n_features))
+
+    @property
+    def supports_inverted_index(self) -> bool:
+        """the inverted index needs non-negative weights, always true for plain tf-idf"""
+        return True
+
+    def build_inverted_index(self):
+        """build the term -> postings index top_k() uses to skip documents that share no terms with the query"""
+        if not self.is_fitted:
+            raise RuntimeError("Transformer is not fitted, call fit() first")
+        from src.transformer.inverted import InvertedIndex
+        self.inverted_index = InvertedIndex(self.matrix)
+        self._rebuild_inverted = False
+        return self.inverted_index
+
+    async def transform(self, documents: List[List[str]]) -> CSRMatrix:
+        """
+        vectorize the docs using TF-IDF
+        each document is a list of tokens. fits the transformer on them and returns
+        a CSRMatrix with one L2-normalized row per document; use matrix.row(i) /
+        matrix[i] to read rows without densifying them.
+        """
+        with tracing.span("transformer.transform", documents=len(documents)):
+            return self.fit(documents).matrix
+
+    def transform_query(self, tokens: List[str]) -> SparseVector:
+        """
+        project a new document into the fitted space. terms that are not in the
+        vocabulary are ignored, so an all-unknown query gives an empty vector.
+        """
+        if not self.is_fitted:
+            raise RuntimeError("Transformer is not fitted, call fit() first")
+        self._sync()
+        with tracing.span("transformer.transform_query"):
+            known = [token for token in tokens if token in self.vocabulary]
+            return self._weigh(CSRMatrix.from_rows([self._count(known)], self.n_features)).getrow(0)
+
+    def _count(self, tokens: List[str]):
+        """(sorted column ids, term counts) of a document, tokens must be in the vocabulary"""
+        cols, counts = np.unique(np.fromiter((self.vocabulary[word] for word in tokens), dtype=np.int32, count=len(tokens)),
+                                 return_counts=True)
+        return cols, counts.astype(np.float64)
+
+    def _weigh(self, counts: CSRMatrix) -> CSRMatrix:
+        """turn a term count matrix into L2-normalized tf-idf rows, dropping zero weights"""
+        n_rows = counts.shape[0]
+        row_ids = counts.row_ids()
+        weights = counts.data * self.idf_values[counts.indices]
+        norms = np.sqrt(np.bincount(row_ids, weights=weights * weights, minlength=n_rows))
+        norms[norms == 0] = 1.0
+        weights /= norms[row_ids]
+        mask = weights != 0
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(row_ids[mask], minlength=n_rows), out=indptr[1:])
+        return CSRMatrix(indptr, counts.indices[mask], weights[mask], counts.shape)
+
+    def similarities(self, query_vec: SparseVector, matrix: Optional[CSRMatrix] = None) -> np.ndarray:
+        """
+        cosine similarity between query_vec and every row of matrix (the fitted corpus by default).
+        rows and queries are already L2-normalized, so this is a single sparse matrix-vector product.
+        """
+        matrix = self.matrix if matrix is None else matrix
+        if matrix is None:
+            raise RuntimeError("Transformer is not fitted, call fit() first")
+        return matrix.dot(query_vec)
+
+    @tracing.traced("transformer.top_k")
+    def top_k(self, query_vec: SparseVector, k: int = 10, matrix: Optional[CSRMatrix] = None,
+              exclude: Optional[Iterable[int]] = None) -> List[Tuple[int, float]]:
+        """
+        the k most similar rows as (row index, score), best first.
+        rows listed in `exclude` (e.g. the query anime itself) and deleted rows are left out.
+        on the fitted corpus this goes through the inverted index when one was built and the query
+        is selective enough for it to be cheaper (InvertedIndex.worth_it); both paths give the same result.
+        incremental updates drop the inverted index (brute force until compact() rebuilds it).
+        """
+        if matrix is None:
+            self._sync()
+            if self.deleted.any():
+                exclude = np.union1d(np.fromiter(exclude if exclude is not None else (), dtype=np.int64), np.flatnonzero(self.deleted))
+        if matrix is None and self.inverted_index is not None and self.inverted_index.worth_it(query_vec):
+            return self.inverted_index.top_k(query_vec, k, exclude=exclude)
+        scores = self.similarities(query_vec, matrix)
+        if exclude is not None:
+            exclude = np.fromiter(exclude, dtype=np.int64)
+            if len(exclude):
+                scores[exclude] = -np.inf
+                k = min(k, len(scores) - len(np.unique(exclude)))
+        return [(int(idx), float(scores[idx])) for idx in select_top_k(scores, k)]
+
     async def cosine_similarity(self, vec1, vec2):
-        v1 = np.array(vec1)
-        v2 = np.array(vec2)
+        with tracing.span("transformer.cosine_similarity"):
+            return self._cosine_similarity(vec1, vec2)
+
+    @staticmethod
+    def _cosine_similarity(vec1, vec2) -> float:
+        if isinstance(vec1, SparseVector) and isinstance(vec2, SparseVector):
+            n1, n2 = vec1.norm(), vec2.norm()
+            if n1 == 0 or n2 == 0:
+                return 0.0
+            return vec1.dot(vec2) / (n1 * n2)
+        v1 = vec1.toarray() if isinstance(vec1, SparseVector) else np.array(vec1)
+        v2 = vec2.toarray() if isinstance(vec2, SparseVector) else np.array(vec2)
         if np.linalg.norm(v1) == 0 or np.linalg.norm(v2) == 0:
             return 0.0
         return float(np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2)))
-        
\ No newline at end of file
+
+    def save(self, path, metadata: Optional[dict] = None):
+        """
+        save the fitted index to the directory `path`: vocabulary and settings as
+        json, idf and the csr arrays as .npy files, plus the raw term counts so the
+        loaded index can still be updated. `metadata` is stored as is and
+        comes back in transformer.metadata after load().
+        """
+        if not self.is_fitted:
+            raise RuntimeError("Transformer is not fitted, call fit() first")
+        self._sync()
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        with open(path / "vocabulary.json", "w", encoding="utf-8") as f:
+            json.dump(terms, f)
+        np.save(path / "idf.npy", self.idf_values)
+        np.save(path / "indptr.npy", self.matrix.indptr)
+        np.save(path / "indices.npy", self.matrix.indices)
+        np.save(path / "data.npy", self.matrix.data)
+        if self.counts is not None:
+            # term counts crus, pra poder continuar atualizando o indice depois do load
+            np.save(path / "counts_indptr.npy", self.counts.indptr)
+            np.save(path / "counts_indices.npy", self.counts.indices)
+            np.save(path / "counts_data.npy", self.counts.data)
+            np.save(path / "df.npy", self.document_frequencies)
+            np.save(path / "deleted.npy", self.deleted)
+        meta = {
+            "min_df": self.min_df,
+            "max_df": self.max_df,
+            "document_count": self.document_count,
+            "shape": list(self.matrix.shape),
+            "metadata": metadata or {},
+        }
+        with open(path / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode: Optional[str] = None) -> "Transformer":
+        """
+        load an index written by save(), ready for transform_query().
+        with mmap_mode='r' the idf and csr arrays are memory-mapped instead of read,
+        so loading is near-constant and processes share one copy through the page cache.
+        """
+        path = Path(path)
+        with open(path / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(path / "vocabulary.json", "r", encoding="utf-8") as f:
+            terms = json.load(f)
+        transformer = cls(min_df=meta["min_df"], max_df=meta["max_df"])
+        transformer.vocabulary = {word: idx for idx, word in enumerate(terms)}
+        transformer.idf_values = np.load(path / "idf.npy", mmap_mode=mmap_mode)
+        transformer.matrix = CSRMatrix(
+            np.load(path / "indptr.npy", mmap_mode=mmap_mode),
+            np.load(path / "indices.npy", mmap_mode=mmap_mode),
+            np.load(path / "data.npy", mmap_mode=mmap_mode),
+            tuple(meta["shape"]),
+        )
+        if (path / "counts_indptr.npy").exists():
+            transformer.counts = CSRMatrix(
+                np.load(path / "counts_indptr.npy", mmap_mode=mmap_mode),
+                np.load(path / "counts_indices.npy", mmap_mode=mmap_mode),
+                np.load(path / "counts_data.npy", mmap_mode=mmap_mode),
+                tuple(meta["shape"]),
+            )
+            transformer.document_frequencies = np.load(path / "df.npy", mmap_mode=mmap_mode)
+            transformer.deleted = np.load(path / "deleted.npy", mmap_mode=mmap_mode)
+        transformer.document_count = meta["document_count"]
+        transformer.metadata = meta.get("metadata", {})
+        transformer.is_fitted = True
+        return transformer
@@ -0,0 +1,33 @@
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+
+class LRUCache(OrderedDict):
+    """
+    dict that keeps at most `maxsize` entries: reading or writing a key makes it the most recent,
+    and inserting past the limit drops the least recently used ones. drop-in for the plain
+    dict caches (anime_cache, episodes_cache) of a long-running process.
+    """
+
+    def __init__(self, maxsize: int, items: Optional[Iterable] = None):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        super().__init__()
+        self.maxsize = maxsize
+        if items is not None:
+            self.update(items)
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
+
+    def get(self, key, default=None):
+        # o get do OrderedDict nao passa pelo __getitem__, sem isso a leitura nao renova a chave
+        return self[key] if key in self else default
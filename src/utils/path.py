@@ -43,3 +43,10 @@ def get_dataset_csv_path(fallback_to_search=True, interactive=False):
 		if found:
 			return found
 	raise FileNotFoundError(f"dataset.csv not found at {dataset_path} and no other CSV found")
+
+
+def get_index_dir():
+	"""return the directory where fitted tf-idf indexes are persisted (constants/index)"""
+	from pathlib import Path
+	base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+	return Path(base_dir) / 'constants' / 'index'
@@ -1,8 +1,13 @@
+import asyncio
 import httpx
 import io
+import json
+import os
+import time
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 
 def _constants_dir() -> Path:
@@ -44,59 +49,165 @@ def _stopwords_zip_url() -> str:
     return "https://raw.githubusercontent.com/nltk/nltk_data/refs/heads/gh-pages/packages/corpora/stopwords.zip"
 
 
-def download_stopwords_with_proxies(proxies: List[str], timeout: float = 10.0, fallback_proxy: Optional[str] = None) -> Optional[bytes]:
-    url = _stopwords_zip_url()
-    for idx, proxy in enumerate(proxies, 1):
-        print(f"  [{idx}/{len(proxies)}] Trying proxy {proxy}...", end=" ")
-        try:
-            mounts = {
-                "http://": httpx.HTTPTransport(proxy=proxy),
-                "https://": httpx.HTTPTransport(proxy=proxy),
-            }
-            client = httpx.Client(mounts=mounts, timeout=timeout)
-            try:
-                resp = client.get(url, headers={"User-Agent": "stopwords-downloader"})
-                resp.raise_for_status()
-                print("✅ SUCCESS!")
-                return resp.content
-            finally:
-                client.close()
-        except Exception as e:
-            print(f"❌ {str(e)[:60]}")
-            continue
+def _health_file() -> Path:
+    return _constants_dir() / "proxy-health.json"
 
-    print("🔄 Trying direct (no proxy)...", end=" ")
+
+def load_proxy_health(path: Optional[Path] = None) -> Dict[str, dict]:
+    """proxy -> {latency, successes, failures, consecutive_failures, last_success, last_failure}"""
+    path = path or _health_file()
     try:
-        client = httpx.Client(timeout=timeout)
-        try:
-            resp = client.get(url, headers={"User-Agent": "stopwords-downloader"})
-            resp.raise_for_status()
-            print("✅ SUCCESS!")
-            return resp.content
-        finally:
-            client.close()
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_proxy_health(health: Dict[str, dict], path: Optional[Path] = None):
+    path = path or _health_file()
+    tmp = path.with_name(path.name + ".tmp")
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(health, f, indent=2)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"⚠️ Could not write proxy health file: {e}")
+
+
+def record_proxy_result(health: Dict[str, dict], proxy: str, latency: Optional[float]):
+    """update a proxy's score: latency in seconds after a success, None after a failure"""
+    entry = health.setdefault(proxy, {"latency": None, "successes": 0, "failures": 0, "consecutive_failures": 0,
+                                      "last_success": None, "last_failure": None})
+    if latency is None:
+        entry["failures"] += 1
+        entry["consecutive_failures"] += 1
+        entry["last_failure"] = time.time()
+    else:
+        # media movel, um proxy que ficou lento perde posicao aos poucos
+        entry["latency"] = latency if entry["latency"] is None else 0.5 * entry["latency"] + 0.5 * latency
+        entry["successes"] += 1
+        entry["consecutive_failures"] = 0
+        entry["last_success"] = time.time()
+
+
+def rank_proxies(proxies: List[str], health: Dict[str, dict]) -> List[str]:
+    """known good proxies first (fastest first), then never tried ones, then the ones failing lately"""
+    def score(item: Tuple[int, str]):
+        position, proxy = item
+        entry = health.get(proxy)
+        if entry is None:
+            return (1, 0.0, position)
+        if entry["consecutive_failures"] == 0 and entry["latency"] is not None:
+            return (0, entry["latency"], position)
+        return (2, entry["consecutive_failures"], position)
+    return [proxy for _, proxy in sorted(enumerate(proxies), key=score)]
+
+
+async def _download(url: str, proxy: Optional[str], timeout: float) -> bytes:
+    async with httpx.AsyncClient(proxy=proxy, timeout=timeout) as client:
+        resp = await client.get(url, headers={"User-Agent": "stopwords-downloader"})
+        resp.raise_for_status()
+        return resp.content
+
+
+async def _try_proxy(url: str, proxy: str, timeout: float, health: Dict[str, dict]) -> Optional[bytes]:
+    start = time.monotonic()
+    try:
+        content = await _download(url, proxy, timeout)
+    except asyncio.CancelledError:
+        raise  # outro proxy ganhou, nao conta como falha
     except Exception as e:
-        print(f"❌ {e}")
+        print(f"  ❌ {proxy}: {(str(e) or type(e).__name__)[:60]}")
+        record_proxy_result(health, proxy, None)
+        return None
+    elapsed = time.monotonic() - start
+    record_proxy_result(health, proxy, elapsed)
+    print(f"  ✅ {proxy} answered in {elapsed:.2f}s")
+    return content
+
+
+async def race_proxies(url: str, proxies: List[str], timeout: float = 10.0, fanout: int = 8,
+                       health: Optional[Dict[str, dict]] = None) -> Optional[bytes]:
+    """
+    download `url` through up to `fanout` proxies at a time, in the given order: every failure
+    starts the next proxy, the first successful response wins and the attempts still running
+    are cancelled. results are recorded in `health` (see record_proxy_result).
+    """
+    health = health if health is not None else {}
+    queue = iter(proxies)
+    running = set()
+
+    def start_next():
+        proxy = next(queue, None)
+        if proxy is not None:
+            running.add(asyncio.ensure_future(_try_proxy(url, proxy, timeout, health)))
 
-    if fallback_proxy:
-        print(f"🔄 Trying fallback proxy {fallback_proxy}...", end=" ")
+    for _ in range(max(1, fanout)):
+        start_next()
+    try:
+        while running:
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            running.difference_update(done)
+            for task in done:
+                content = task.result()
+                if content is not None:
+                    return content
+                start_next()
+        return None
+    finally:
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+
+
+async def download_stopwords_async(proxies: List[str], timeout: float = 10.0, fallback_proxy: Optional[str] = None,
+                                   fanout: int = 8, url: Optional[str] = None,
+                                   health_file: Optional[Path] = None) -> Optional[bytes]:
+    """
+    race the proxies (fastest known first, from the health file), then try direct, then the fallback proxy.
+    the health file is updated with every proxy result so the next cold start picks better ones first.
+    """
+    url = url or _stopwords_zip_url()
+    health = load_proxy_health(health_file)
+    try:
+        if proxies:
+            print(f"🏁 Racing {len(proxies)} proxies ({fanout} at a time)...")
+            content = await race_proxies(url, rank_proxies(proxies, health), timeout, fanout, health)
+            if content is not None:
+                return content
+
+        print("🔄 Trying direct (no proxy)...", end=" ")
         try:
-            mounts = {
-                "http://": httpx.HTTPTransport(proxy=fallback_proxy),
-                "https://": httpx.HTTPTransport(proxy=fallback_proxy),
-            }
-            client = httpx.Client(mounts=mounts, timeout=timeout)
-            try:
-                resp = client.get(url, headers={"User-Agent": "stopwords-downloader"})
-                resp.raise_for_status()
-                print("✅ SUCCESS!")
-                return resp.content
-            finally:
-                client.close()
+            content = await _download(url, None, timeout)
+            print("✅ SUCCESS!")
+            return content
         except Exception as e:
             print(f"❌ {e}")
 
-    return None
+        if fallback_proxy:
+            print(f"🔄 Trying fallback proxy {fallback_proxy}...")
+            return await _try_proxy(url, fallback_proxy, timeout, health)
+        return None
+    finally:
+        if proxies or fallback_proxy:
+            save_proxy_health(health, health_file)
+
+
+def _run_sync(coro):
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # ja tem um loop rodando nessa thread (ex: primeiro tokenize dentro de um create_doc), roda num thread proprio
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
+def download_stopwords_with_proxies(proxies: List[str], timeout: float = 10.0, fallback_proxy: Optional[str] = None,
+                                    fanout: int = 8, url: Optional[str] = None,
+                                    health_file: Optional[Path] = None) -> Optional[bytes]:
+    """blocking version of download_stopwords_async, safe to call with or without a running event loop"""
+    return _run_sync(download_stopwords_async(proxies, timeout, fallback_proxy, fanout, url, health_file))
 
 
 def extract_english_stopwords_from_zip_bytes(zip_bytes: bytes) -> List[str]:
@@ -0,0 +1,222 @@
+"""
+lightweight tracing for the recommendation pipeline: timing spans and counters.
+
+    from src.utils import tracing
+    tracing.enable()
+    with tracing.span("transformer.fit", documents=len(docs)):
+        ...
+    tracing.count("api.cache.hit")
+    print(tracing.summary())            # table per span name + counters
+    tracing.export_json("trace.json")   # otlp-style json
+
+disabled by default (or set KORI_TRACE=1); while disabled span() hands out one shared no-op
+context manager and count() returns right away, so instrumented code pays a flag check.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import os
+import secrets
+import time
+from typing import Callable, Dict, List, Optional
+
+_enabled = os.environ.get("KORI_TRACE", "") not in ("", "0")
+# guarda no maximo isso de spans individuais pro export, as estatisticas por nome nao tem limite
+MAX_SPANS = 100_000
+
+_current: contextvars.ContextVar = contextvars.ContextVar("kori_span", default=None)
+_trace_id = secrets.token_hex(16)
+_stats: Dict[str, List[float]] = {}  # nome -> [count, total_ns, min_ns, max_ns]
+_counters: Dict[str, float] = {}
+_spans: List[dict] = []
+
+
+def enable(on: bool = True):
+    global _enabled
+    _enabled = on
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset():
+    """drop everything recorded so far (spans, stats and counters) and start a new trace id"""
+    global _trace_id
+    _stats.clear()
+    _counters.clear()
+    _spans.clear()
+    _trace_id = secrets.token_hex(16)
+
+
+class _Span:
+    __slots__ = ("name", "attributes", "span_id", "parent", "start_ns", "start_unix_ns", "_token")
+
+    def __init__(self, name: str, attributes: dict):
+        self.name = name
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        """add attributes once they are known (e.g. the response size)"""
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "_Span":
+        parent = _current.get()
+        self.parent = parent.span_id if parent is not None else None
+        self.span_id = secrets.token_hex(8)
+        self._token = _current.set(self)
+        self.start_unix_ns = time.time_ns()
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter_ns() - self.start_ns
+        _current.reset(self._token)
+        stats = _stats.get(self.name)
+        if stats is None:
+            _stats[self.name] = [1, elapsed, elapsed, elapsed]
+        else:
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = min(stats[2], elapsed)
+            stats[3] = max(stats[3], elapsed)
+        if len(_spans) < MAX_SPANS:
+            _spans.append({
+                "name": self.name,
+                "spanId": self.span_id,
+                "parentSpanId": self.parent,
+                "startTimeUnixNano": self.start_unix_ns,
+                "endTimeUnixNano": self.start_unix_ns + elapsed,
+                "attributes": self.attributes,
+                "error": exc_type.__name__ if exc_type is not None else None,
+            })
+        return False
+
+
+class _NoopSpan:
+    """what span() gives when tracing is off and the caller wants to set attributes"""
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, **attributes):
+    """time the block under `name`; nested spans (also across awaits) record their parent"""
+    if not _enabled:
+        return _NOOP_SPAN
+    return _Span(name, attributes)
+
+
+def count(name: str, value: float = 1):
+    """add `value` to the counter `name` (cache hits, bytes fetched, tokens...)"""
+    if _enabled:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """decorator version of span() for sync and async functions, named module.qualname by default"""
+    def decorate(fn):
+        span_name = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__qualname__}"
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not _enabled:
+                    return await fn(*args, **kwargs)
+                with _Span(span_name, {}):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(span_name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def stats() -> dict:
+    """{'spans': {name: {count, total_ms, mean_ms, min_ms, max_ms}}, 'counters': {...}}"""
+    return {
+        "spans": {
+            name: {
+                "count": int(c),
+                "total_ms": total / 1e6,
+                "mean_ms": total / c / 1e6,
+                "min_ms": low / 1e6,
+                "max_ms": high / 1e6,
+            }
+            for name, (c, total, low, high) in _stats.items()
+        },
+        "counters": dict(_counters),
+    }
+
+
+def summary() -> str:
+    """per-run table: one line per span name (slowest total first), then the counters"""
+    data = stats()
+    lines = [f"{'span':<40} {'count':>8} {'total ms':>11} {'mean ms':>10} {'max ms':>10}"]
+    for name, row in sorted(data["spans"].items(), key=lambda item: -item[1]["total_ms"]):
+        lines.append(f"{name:<40} {row['count']:>8} {row['total_ms']:>11.2f} {row['mean_ms']:>10.3f} {row['max_ms']:>10.2f}")
+    if data["counters"]:
+        lines.append("")
+        lines.append(f"{'counter':<40} {'value':>8}")
+        for name, value in sorted(data["counters"].items()):
+            lines.append(f"{name:<40} {value:>8g}")
+    return "\n".join(lines)
+
+
+def _attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def export_json(path=None) -> dict:
+    """
+    the recorded spans in the otlp/json trace layout (resourceSpans -> scopeSpans -> spans),
+    plus the counters and per-name stats; written to `path` when given.
+    """
+    spans = []
+    for record in _spans:
+        item = {
+            "traceId": _trace_id,
+            "spanId": record["spanId"],
+            "name": record["name"],
+            "kind": 1,
+            "startTimeUnixNano": str(record["startTimeUnixNano"]),
+            "endTimeUnixNano": str(record["endTimeUnixNano"]),
+            "attributes": [_attribute(key, value) for key, value in record["attributes"].items()],
+        }
+        if record["parentSpanId"]:
+            item["parentSpanId"] = record["parentSpanId"]
+        if record["error"]:
+            item["status"] = {"code": 2, "message": record["error"]}
+        spans.append(item)
+    data = {
+        "resourceSpans": [{
+            "resource": {"attributes": [_attribute("service.name", "kori")]},
+            "scopeSpans": [{"scope": {"name": "kori.tracing"}, "spans": spans}],
+        }],
+        **stats(),
+    }
+    if path is not None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+    return data
@@ -0,0 +1,101 @@
+"""add / update / delete / compact on a fitted Transformer must match refitting it on the live documents"""
+import unittest
+
+import numpy as np
+
+from src.transformer.transformer import Transformer
+
+
+def _rows_by_term(transformer: Transformer, rows):
+    """{term: weight} of each row, so matrices with different column orders can be compared"""
+    terms = sorted(transformer.vocabulary, key=transformer.vocabulary.get)
+    matrix = transformer.matrix
+    result = []
+    for row in rows:
+        cols, weights = matrix.row(int(row))
+        result.append({terms[col]: weight for col, weight in zip(cols, weights)})
+    return result
+
+
+class IncrementalTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        self.words = [f"w{i}" for i in range(150)]
+        self.rng = rng
+        self.docs = [self._doc() for _ in range(200)]
+        self.transformer = Transformer().fit(self.docs)
+        self.transformer.build_inverted_index()
+        self.live = list(range(len(self.docs)))  # linha do transformer -> documento
+
+    def _doc(self):
+        return list(self.rng.choice(self.words, size=int(self.rng.integers(3, 15))))
+
+    def _add(self, docs):
+        rows = self.transformer.add_documents(docs)
+        self.docs.extend(docs)
+        self.live.extend(range(len(self.docs) - len(docs), len(self.docs)))
+        return rows
+
+    def _apply_updates(self):
+        self._add([self._doc() + ["brandnew"] for _ in range(15)])
+        deleted = [int(row) for row in self.rng.choice(len(self.live), size=30, replace=False)]
+        self.transformer.delete_documents(deleted)
+        for row in deleted:
+            self.live[row] = None
+        # update = apaga a linha e adiciona a versao nova no fim
+        row = next(row for row, doc in enumerate(self.live) if doc is not None)
+        self.docs.append(self._doc())
+        new_row = self.transformer.update_document(row, self.docs[-1])
+        self.live[row] = None
+        self.live.append(len(self.docs) - 1)
+        self.assertEqual(new_row, len(self.live) - 1)
+
+    def _refit(self):
+        rows = [row for row, doc in enumerate(self.live) if doc is not None]
+        return Transformer().fit([self.docs[self.live[row]] for row in rows]), rows
+
+    def _assert_same_rows(self, updated_rows, refit, refit_rows):
+        got, expected = _rows_by_term(self.transformer, updated_rows), _rows_by_term(refit, refit_rows)
+        self.assertEqual(len(got), len(expected))
+        for row, (a, b) in enumerate(zip(got, expected)):
+            self.assertEqual(a.keys(), b.keys(), f"row {row}")
+            np.testing.assert_allclose([a[term] for term in b], list(b.values()), rtol=1e-12, err_msg=f"row {row}")
+
+    def test_updates_match_refit(self):
+        self._apply_updates()
+        refit, rows = self._refit()
+        self._assert_same_rows(rows, refit, range(len(rows)))
+        for row in [row for row, doc in enumerate(self.live) if doc is None]:
+            self.assertEqual(len(self.transformer.matrix.row(row)[0]), 0)
+
+    def test_top_k_skips_deleted_rows(self):
+        self._apply_updates()
+        refit, rows = self._refit()
+        for doc in (self.docs[0], self.docs[-1], ["brandnew", "w1"]):
+            got = self.transformer.top_k(self.transformer.transform_query(doc), 10)
+            expected = refit.top_k(refit.transform_query(doc), 10)
+            self.assertEqual([row for row, _ in got], [rows[row] for row, _ in expected])
+            np.testing.assert_allclose([score for _, score in got], [score for _, score in expected], rtol=1e-12)
+
+    def test_compact_matches_refit(self):
+        self._apply_updates()
+        refit, rows = self._refit()
+        mapping = self.transformer.compact()
+        np.testing.assert_array_equal(mapping[rows], np.arange(len(rows)))
+        self.assertTrue((mapping[[row for row, doc in enumerate(self.live) if doc is None]] == -1).all())
+        self.assertEqual(set(self.transformer.vocabulary), set(refit.vocabulary))
+        self._assert_same_rows(range(len(rows)), refit, range(len(rows)))
+        self.assertIsNotNone(self.transformer.inverted_index)
+        query_vec = self.transformer.transform_query(self.docs[-1])
+        self.assertEqual(self.transformer.inverted_index.top_k(query_vec, 10), self.transformer.top_k(query_vec, 10))
+
+    def test_updates_drop_the_inverted_index(self):
+        self._add([self._doc()])
+        self.transformer.top_k(self.transformer.transform_query(self.docs[0]), 5)
+        self.assertIsNone(self.transformer.inverted_index)
+        self.transformer.compact()
+        self.assertIsNotNone(self.transformer.inverted_index)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+the repl and the cli must land on the same binary index: `build-neighbors` (no --limit) and the
+repl "all" choice, or any limit at least as large as the dataset, share one build and its neighbour table.
+
+    python -m unittest discover tests
+"""
+import asyncio
+import csv
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+import main
+from src.cli import run
+
+WORDS = ["pirate", "ninja", "dragon", "school", "magic", "robot", "space", "village", "sword", "demon"]
+
+
+def _write_dataset(path: Path, rows: int = 40):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["anime_id", "Name", "sypnopsis"])
+        for i in range(rows):
+            synopsis = " ".join(WORDS[(i + j) % len(WORDS)] for j in range(3 + i % 4))
+            writer.writerow([i + 1, f"Anime {i}", synopsis])
+
+
+class IndexLimitTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.csv_path = str(root / "dataset.csv")
+        self.index_dir = root / "index"
+        _write_dataset(Path(self.csv_path))
+        patcher = mock.patch("src.utils.path.get_index_dir", return_value=self.index_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def _repl_index(self, limit):
+        async def load():
+            try:
+                return await main.get_fitted_index(self.csv_path, limit)
+            finally:
+                await main.close_fitted_indexes()
+        with redirect_stdout(StringIO()):
+            return asyncio.run(load())
+
+    def _cli(self, *argv) -> int:
+        with redirect_stdout(StringIO()):
+            return run(list(argv))
+
+    def test_repl_finds_cli_neighbors(self):
+        self.assertEqual(self._cli("build-neighbors", "--csv", self.csv_path, "--k", "5"), 0)
+        for limit in (None, 9999999, 40):
+            index = self._repl_index(limit)
+            self.assertIsNotNone(index.neighbors, f"limit={limit}")
+            self.assertEqual(len(index), 40)
+        self.assertEqual(len(list(self.index_dir.iterdir())), 1)
+
+    def test_large_limit_is_stored_as_full_build(self):
+        path = self._repl_index(9999999).path
+        self.assertIsNone(self._repl_index(9999999).neighbors)
+        self.assertEqual(self._cli("build-neighbors", "--csv", self.csv_path, "--k", "5"), 0)
+        index = self._repl_index(None)
+        self.assertEqual(index.path, path)
+        self.assertIsNotNone(index.neighbors)
+
+    def test_smaller_limit_keeps_its_own_build(self):
+        full = self._repl_index(None).path
+        partial = self._repl_index(10)
+        self.assertNotEqual(partial.path, full)
+        self.assertEqual(len(partial), 10)
+        self.assertTrue((full / "index.json").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
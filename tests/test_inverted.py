@@ -0,0 +1,86 @@
+"""InvertedIndex.top_k must give exactly what brute force select_top_k(matrix.dot(q)) gives"""
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from src.transformer.inverted import InvertedIndex
+from src.transformer.sparse import select_top_k
+from src.transformer.transformer import Transformer
+
+
+def _brute_force(matrix, query_vec, k, exclude=()):
+    scores = matrix.dot(query_vec)
+    exclude = np.unique(np.fromiter(exclude, dtype=np.int64))
+    scores[exclude] = -np.inf
+    k = min(k, len(scores) - len(exclude))
+    return [(int(idx), float(scores[idx])) for idx in select_top_k(scores, k)]
+
+
+class InvertedTopKTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(11)
+        words = [f"w{i}" for i in range(300)]
+        docs = [list(rng.choice(words, size=int(rng.integers(3, 20)), p=cls._zipf(len(words)))) for _ in range(500)]
+        # documentos repetidos empatam no score, o desempate tem que ser o mesmo
+        docs += [docs[i] for i in range(0, 100, 3)]
+        cls.transformer = Transformer().fit(docs)
+        cls.matrix = cls.transformer.matrix
+        cls.index = InvertedIndex(cls.matrix)
+        cls.words = words
+        cls.docs = docs
+        cls.rng = rng
+
+    @staticmethod
+    def _zipf(n):
+        weights = 1.0 / np.arange(1, n + 1)
+        return weights / weights.sum()
+
+    def _queries(self):
+        yield self.transformer.transform_query(self.docs[0])
+        yield self.transformer.transform_query(self.docs[3])
+        yield self.transformer.transform_query(self.words[-2:])  # termos raros, poucos docs com score > 0
+        for _ in range(20):
+            yield self.transformer.transform_query(list(self.rng.choice(self.words, size=int(self.rng.integers(1, 12)))))
+
+    def test_matches_brute_force(self):
+        for query_vec in self._queries():
+            for k in (1, 5, 10, 50):
+                self.assertEqual(self.index.top_k(query_vec, k), _brute_force(self.matrix, query_vec, k), f"k={k}")
+
+    def test_exclude(self):
+        for query_vec in self._queries():
+            best = [idx for idx, _ in _brute_force(self.matrix, query_vec, 5)]
+            for exclude in ([best[0]], best[:3], [0, 1, 2]):
+                self.assertEqual(self.index.top_k(query_vec, 10, exclude=exclude),
+                                 _brute_force(self.matrix, query_vec, 10, exclude))
+
+    def test_pads_with_zero_scores(self):
+        query_vec = self.transformer.transform_query(self.words[-1:])
+        hits = int((self.matrix.dot(query_vec) > 0).sum())
+        k = hits + 10
+        result = self.index.top_k(query_vec, k, exclude=[0, 2])
+        self.assertEqual(result, _brute_force(self.matrix, query_vec, k, [0, 2]))
+        self.assertEqual([score for _, score in result[hits:]], [0.0] * 10)
+
+    def test_k_larger_than_corpus(self):
+        query_vec = self.transformer.transform_query(self.docs[1])
+        n_docs = self.matrix.shape[0]
+        self.assertEqual(self.index.top_k(query_vec, n_docs + 5, exclude=[1]),
+                         _brute_force(self.matrix, query_vec, n_docs + 5, [1]))
+
+    def test_transformer_uses_either_path(self):
+        transformer = Transformer().fit(self.docs)
+        queries = list(self._queries())
+        expected = [transformer.top_k(q, 10, exclude=[4]) for q in queries]
+        transformer.build_inverted_index()
+        # corpus pequeno demais pro worth_it escolher o indice sozinho
+        with mock.patch.object(InvertedIndex, "worth_it", return_value=True), \
+                mock.patch.object(InvertedIndex, "top_k", autospec=True, side_effect=InvertedIndex.top_k) as top_k:
+            self.assertEqual([transformer.top_k(q, 10, exclude=[4]) for q in queries], expected)
+        self.assertEqual(top_k.call_count, len(queries))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+"""the precomputed neighbour table must match Transformer.top_k, ties included (identical synopses tie at 1.0)"""
+import unittest
+
+import numpy as np
+
+from src.transformer.neighbors import compute_neighbors
+from src.transformer.sparse import select_top_k
+from src.transformer.transformer import Transformer
+
+
+class NeighborsTest(unittest.TestCase):
+    def test_matches_brute_force_with_ties(self):
+        rng = np.random.default_rng(3)
+        words = [f"w{i}" for i in range(60)]
+        base = [list(rng.choice(words, 8)) for _ in range(40)]
+        # 2 de cada 3 documentos repetem um dos 40 textos base
+        docs = [base[i % 40] if i % 3 else list(rng.choice(words, 8)) for i in range(400)]
+        transformer = Transformer().fit(docs)
+        matrix = transformer.matrix
+        dense = np.array([matrix.dot(matrix.getrow(row)) for row in range(matrix.shape[0])])
+        for k in (1, 5, 10, 50):
+            neighbors, _ = compute_neighbors(matrix, k=k, block_rows=64)
+            for row in range(matrix.shape[0]):
+                scores = dense[row].copy()
+                scores[row] = -np.inf
+                expected = [int(idx) for idx in select_top_k(scores, k) if scores[idx] > 0]
+                self.assertEqual([int(idx) for idx in neighbors[row] if idx >= 0], expected, f"k={k} row={row}")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,26 @@
+"""
+`import main` must stay light: the heavy modules (benchmarks.startup.DEFERRED_MODULES) are only
+imported once a search needs them. the wall clock budget is checked by `python -m benchmarks.startup`.
+"""
+import json
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+from benchmarks.startup import DEFERRED_MODULES
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class StartupImportsTest(unittest.TestCase):
+    def test_main_does_not_import_deferred_modules(self):
+        # processo novo: aqui dentro os outros testes ja carregaram numpy e cia
+        done = subprocess.run([sys.executable, "-c", "import json, sys, main; print(json.dumps(sorted(sys.modules)))"],
+                              cwd=ROOT, capture_output=True, text=True, check=True)
+        loaded = json.loads(done.stdout.splitlines()[-1])
+        self.assertEqual([module for module in DEFERRED_MODULES if module in loaded], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
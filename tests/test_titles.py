@@ -0,0 +1,40 @@
+"""TitleIndex.resolve: the MAL id is authoritative and titles only resolve when they are unambiguous"""
+import unittest
+
+import numpy as np
+
+from src.transformer.titles import TitleIndex
+
+TITLES = ["Shingeki no Kyojin", "Shingeki no Kyojin Season 3", "Gintama", "Gintama'", "Gintama.", "Monster"]
+MAL_IDS = [16498, 35760, 918, 9969, 15417, 19]
+
+
+class ResolveTest(unittest.TestCase):
+    def setUp(self):
+        self.index = TitleIndex(TITLES, np.array(MAL_IDS))
+
+    def test_mal_id_wins(self):
+        self.assertEqual(self.index.resolve(1, 35760, ["Shingeki no Kyojin"]), 1)
+
+    def test_mal_id_outside_dataset_is_not_matched_by_title(self):
+        # season 2 (mal 25777) nao ta no dataset, o titulo da season 3 nao pode responder por ela
+        self.assertIsNone(self.index.resolve(2, 25777, ["Shingeki no Kyojin Season 2"]))
+        self.assertIsNone(self.index.resolve(3, 25777, ["Shingeki no Kyojin"]))
+
+    def test_title_without_mal_id(self):
+        self.assertEqual(self.index.resolve(4, None, [None, "MONSTER"]), 5)
+
+    def test_ambiguous_title_resolves_to_none(self):
+        self.assertIsNone(self.index.resolve(5, None, ["Gintama"]))
+
+    def test_fuzzy_is_opt_in(self):
+        self.assertIsNone(self.index.resolve(6, None, ["Shingeki no Kyojin Season 2"]))
+        self.assertEqual(self.index.resolve(7, None, ["Shingeki no Kyojin Season 2"], fuzzy_score=0.9), 1)
+
+    def test_result_is_remembered(self):
+        self.assertEqual(self.index.resolve(8, 19), 5)
+        self.assertEqual(self.index.resolve(8), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+"""tokenize must give the same tokens as the original remove_html_tags / re.sub / nltk.wordpunct_tokenize pipeline"""
+import random
+import re
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from src.transformer import transformer
+from src.utils.remove_html_tags import remove_html_tags
+
+try:
+    import nltk
+except ImportError:
+    nltk = None
+
+ALPHABET = ("abcdefghijklmnopqrstuvwxyz" * 3 + "ABCDEFGHIJKLMNOPQRSTUVWXYZ" + "    \t\n\r\f\v" + "0123456789_'-.,!?;:()\"&/"
+            + "\xa0\x85 　\x1c\x1d\x1e\x1f" + "éÉçñüßİıÅﬁΣ日本")
+SNIPPETS = ["<br>", "<br />", "<i>", "</i>", "<b>Bold</b>", "<a href=\"x\">", "< p >", "<", ">", "&amp;", "(Source: ANN)",
+            "the ", "and ", "of ", "an ", "it's ", "don't "]
+
+
+def _old_tokenize(text):
+    # pipeline de antes do tokenize compilado (Transformer.preprocess)
+    if not text or not isinstance(text, str):
+        return []
+    text = remove_html_tags(text)
+    text = text.lower()
+    text = re.sub(r'[^a-z\s]', '', text)
+    tokens = nltk.wordpunct_tokenize(text)
+    return [token for token in tokens if token not in transformer.get_stopwords() and len(token) >= 3]
+
+
+def _random_text(rng: random.Random) -> str:
+    parts = []
+    for _ in range(rng.randint(0, 40)):
+        if rng.random() < 0.2:
+            parts.append(rng.choice(SNIPPETS))
+        else:
+            parts.append("".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 12))))
+    return "".join(parts)
+
+
+@unittest.skipIf(nltk is None, "nltk is not installed")
+class TokenizeTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with redirect_stdout(StringIO()):
+            transformer.get_stopwords()
+
+    def test_synopses(self):
+        texts = [
+            "",
+            "Gintoki, Shinpachi, and Kagura return as the fun-loving but broke members of the Yorozuya team!",
+            "A <i>fierce</i> battle begins.<br><br>(Source: MAL Rewrite)",
+            "Eren Jaeger vows to kill every Titan... In the year 845, the wall is breached.",
+            "Naïve café owner Ōtsuki meets İlkay — ÜBER-COOL heroes　in Tōkyō",
+            "field\x1cseparated\x1drecord\x1eunit\x1fdata and\x1c\x1dstuff",
+            "line one\nline two\r\n\ttabbed\x0bvertical\x0cfeed\x85next sep",
+        ]
+        for text in texts:
+            self.assertEqual(transformer.tokenize(text), _old_tokenize(text), repr(text))
+
+    def test_random_text(self):
+        rng = random.Random(18)
+        for _ in range(3000):
+            text = _random_text(rng)
+            self.assertEqual(transformer.tokenize(text), _old_tokenize(text), repr(text))
+
+    def test_non_strings(self):
+        for value in (None, 0, float("nan"), b"bytes"):
+            self.assertEqual(transformer.tokenize(value), [])
+
+
+if __name__ == "__main__":
+    unittest.main()